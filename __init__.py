@@ -15,6 +15,8 @@ from .nodes import send_to_controller  # Add this import
 from .nodes import first_non_empty_segm  # Add new import
 from .nodes import segs_compare  # Add new import
 from .nodes import image_fallback  # Add new import
+from .nodes import style_search  # Add new import
+from .nodes import hash_warmer
 
 import os
 import shutil
@@ -37,6 +39,7 @@ NODE_CLASS_MAPPINGS = {
     **first_non_empty_segm.NODE_CLASS_MAPPINGS,  # Add new mapping
     **segs_compare.NODE_CLASS_MAPPINGS,  # Add new mapping
     **image_fallback.NODE_CLASS_MAPPINGS,  # Add new mapping
+    **style_search.NODE_CLASS_MAPPINGS,  # Add new mapping
 }
 
 NODE_DISPLAY_NAME_MAPPINGS = {
@@ -56,14 +59,15 @@ NODE_DISPLAY_NAME_MAPPINGS = {
     **first_non_empty_segm.NODE_DISPLAY_NAME_MAPPINGS,  # Add new mapping
     **segs_compare.NODE_DISPLAY_NAME_MAPPINGS,  # Add new mapping
     **image_fallback.NODE_DISPLAY_NAME_MAPPINGS,  # Add new mapping
+    **style_search.NODE_DISPLAY_NAME_MAPPINGS,  # Add new mapping
 }
 
 # Copy the JavaScript file to the appropriate location
 js_src = os.path.join(os.path.dirname(__file__), "js", "moser_styles_full.js")
 js_dest = os.path.join(folder_paths.base_path, "web", "extensions", "moser_styles_full.js")
 
-# Create a symbolic link for the JSON file
-json_src = os.path.join(os.path.dirname(__file__), "data", "moser_styles_full_data.json")
+# The Moser Styles Full state is now served from memory by a route in
+# nodes/moser_styles_full.py, remove the link or copy older versions left in web/
 json_dest = os.path.join(folder_paths.base_path, "web", "moser_styles_full_data.json")
 
 # Ensure the destination directory exists
@@ -74,15 +78,11 @@ if not os.path.exists(js_dest) or os.path.getmtime(js_src) > os.path.getmtime(js
     shutil.copy2(js_src, js_dest)
     print(f"Copied {js_src} to {js_dest}")
 
-# Create symbolic link for JSON file
-if os.path.exists(json_dest):
+if os.path.lexists(json_dest):
     os.remove(json_dest)
-try:
-    os.symlink(json_src, json_dest)
-    print(f"Created symbolic link from {json_src} to {json_dest}")
-except OSError as e:
-    # If symlink fails, try to copy the file
-    shutil.copy2(json_src, json_dest)
-    print(f"Copied {json_src} to {json_dest}")
+    print(f"Removed {json_dest}")
+
+# Optionally hash the model folders in the background, see nodes/hash_warmer.py
+hash_warmer.start_from_env()
 
 __all__ = ['NODE_CLASS_MAPPINGS', 'NODE_DISPLAY_NAME_MAPPINGS']
@@ -0,0 +1,75 @@
+"""Compare the legacy encoding loop with the one-pass encoding sniffer.
+
+Generates style CSVs that are ASCII apart from a single windows-1252 byte near
+the end of the file - the worst case for the old loop, which decoded almost the
+whole file as UTF-8 before failing and starting over.
+
+    python benchmarks/bench_encoding.py [rows ...]
+"""
+import csv
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nodes import style_encoding  # noqa: E402
+
+LEGACY_ENCODINGS = ['utf-8', 'ISO-8859-1', 'utf-16', 'windows-1252']
+
+
+def make_csv(path, rows):
+    with open(path, "w", newline="", encoding="windows-1252") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Number", "Name", "Positive", "Negative", "Lora"])
+        for i in range(1, rows + 1):
+            writer.writerow([i, f"Style {i}", f"a photo of subject {i}, detailed, soft light, 35mm <lora:detail_{i % 50}:0.7>",
+                             "blurry, lowres", ""])
+        # One smart quote in the last row is enough to break UTF-8
+        writer.writerow([rows + 1, "Style ’last’", "a photo", "blurry", ""])
+
+
+def legacy_parse(path):
+    for encoding in LEGACY_ENCODINGS:
+        try:
+            with open(path, encoding=encoding) as f:
+                return encoding, list(csv.DictReader(f))
+        except UnicodeDecodeError:
+            continue
+
+
+def sniffed_parse(path):
+    stat = os.stat(path)
+    with open(path, "rb") as f:
+        data = f.read()
+    encoding, text = style_encoding.decode((os.path.abspath(path), stat.st_size, stat.st_mtime_ns), data)
+    return encoding, list(csv.DictReader(io.StringIO(text, newline="")))
+
+
+def best_of(func, path, repeat=3):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(path)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main(sizes):
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'rows':>9} {'MB':>7} {'legacy s':>9} {'sniffed s':>10} {'speedup':>8}  encodings")
+        for rows in sizes:
+            path = os.path.join(tmp, f"styles_{rows}.csv")
+            make_csv(path, rows)
+            size_mb = os.path.getsize(path) / 1e6
+            legacy_time, (legacy_encoding, legacy_rows) = best_of(legacy_parse, path)
+            sniffed_time, (sniffed_encoding, sniffed_rows) = best_of(sniffed_parse, path)
+            assert len(legacy_rows) == len(sniffed_rows)
+            print(f"{rows:>9} {size_mb:>7.1f} {legacy_time:>9.3f} {sniffed_time:>10.3f} {legacy_time / sniffed_time:>7.2f}x"
+                  f"  {legacy_encoding} -> {sniffed_encoding}")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 500_000])
@@ -0,0 +1,92 @@
+"""Benchmark model file hashing throughput.
+
+Writes a synthetic model file and compares the MB/s of the old get_sha256
+(4 KB reads in a Python loop) with file_hash.hash_file at a few chunk sizes,
+then hashes several files at once on threads to show that hashing runs in
+parallel. The file is read back from the page cache after the first pass, so
+the numbers are an upper bound on what a cold disk would give.
+
+    python benchmarks/bench_hashing.py
+    python benchmarks/bench_hashing.py --size 2048 --files 4 --repeat 3
+"""
+import argparse
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def legacy_sha256(filename):
+    hash_sha256 = hashlib.sha256()
+    with open(filename, "rb") as f:
+        for chunk in iter(lambda: f.read(4096), b""):
+            hash_sha256.update(chunk)
+    return hash_sha256.hexdigest()
+
+
+def make_file(path, size_mb):
+    block = os.urandom(1024 * 1024)
+    with open(path, "wb") as f:
+        for _ in range(size_mb):
+            f.write(block)
+
+
+def best_of(repeat, call):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = call()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=1024, help="file size in MB")
+    parser.add_argument("--files", type=int, default=4, help="files hashed at once in the parallel run")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    sys.path.insert(0, ROOT)
+    from nodes import file_hash
+
+    work_dir = tempfile.mkdtemp(prefix="moser_hash_bench_")
+    try:
+        paths = [os.path.join(work_dir, f"model_{i}.safetensors") for i in range(args.files)]
+        for path in paths:
+            make_file(path, args.size)
+
+        expected = legacy_sha256(paths[0])
+        print(f"{'method':<28} {'seconds':>8} {'MB/s':>9}")
+
+        def report(name, seconds, digest, megabytes=args.size):
+            assert digest == expected or digest is None, name
+            print(f"{name:<28} {seconds:>8.3f} {megabytes / seconds:>9.0f}")
+
+        report("legacy 4 KB loop", *best_of(args.repeat, lambda: legacy_sha256(paths[0])))
+        for chunk_mb in (1, 8, 32):
+            chunk = chunk_mb * 1024 * 1024
+            report(f"hash_file {chunk_mb} MB chunks",
+                   *best_of(args.repeat, lambda: file_hash.hash_file(paths[0], chunk_bytes=chunk)))
+
+        updates = []
+        report("hash_file with progress",
+               *best_of(args.repeat, lambda: file_hash.hash_file(paths[0], progress=lambda done, total: updates.append(done))))
+
+        # Distinct files on separate threads, total throughput across all of them
+        with ThreadPoolExecutor(args.files) as pool:
+            seconds, _ = best_of(args.repeat, lambda: list(pool.map(legacy_sha256, paths)))
+            report(f"legacy x{args.files} threads", seconds, None, args.size * args.files)
+            seconds, _ = best_of(args.repeat, lambda: list(pool.map(file_hash.hash_file, paths)))
+            report(f"hash_file x{args.files} threads", seconds, None, args.size * args.files)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""Benchmark the CSV-driven style nodes against synthetic style libraries.
+
+Generates style CSVs from 1k to 500k rows in several encodings, with LoRA tags
+in the prompts, and times MoserStylesLoader, MoserStylesFull, MoserPromptMixer
+(in both tag modes) and ValueOverrideNode cold (nothing cached, no index on
+disk) and warm (repeated lookups of random styles). ComfyUI's folder_paths and server modules
+are stubbed so this runs without a ComfyUI install.
+
+    python benchmarks/bench_styles.py
+    python benchmarks/bench_styles.py --rows 1000 50000 --warm 500 --encodings utf-8
+"""
+import argparse
+import contextlib
+import csv
+import io
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+import types
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORK_DIR = tempfile.mkdtemp(prefix="moser_bench_")
+STYLES_DIR = os.path.join(WORK_DIR, "styles")
+
+ENCODINGS = ["utf-8", "utf-8-sig", "windows-1252"]
+WORDS = ["portrait", "cinematic", "soft light", "bokeh", "35mm", "film grain", "neon", "rain", "golden hour",
+         "studio", "dramatic shadows", "pastel", "oil painting", "watercolor", "macro", "wide angle"]
+
+
+def install_stubs():
+    """Stand-ins for the ComfyUI modules the style nodes import"""
+    folder_paths = types.ModuleType("folder_paths")
+    folder_paths.base_path = WORK_DIR
+    sys.modules.setdefault("folder_paths", folder_paths)
+
+    class Routes:
+        def get(self, path):
+            return lambda handler: handler
+
+    server = types.ModuleType("server")
+    server.PromptServer = type("PromptServer", (), {"instance": types.SimpleNamespace(routes=Routes())})
+    sys.modules.setdefault("server", server)
+
+    try:
+        import aiohttp.web  # noqa: F401
+    except ImportError:
+        aiohttp = types.ModuleType("aiohttp")
+        aiohttp.web = types.ModuleType("aiohttp.web")
+        aiohttp.web.json_response = lambda data: data
+        sys.modules["aiohttp"] = aiohttp
+        sys.modules["aiohttp.web"] = aiohttp.web
+
+
+def make_csv(path, rows, encoding, rng):
+    with open(path, "w", newline="", encoding=encoding) as f:
+        writer = csv.writer(f)
+        writer.writerow(["Number", "Name", "Positive", "Negative", "Lora", "PDXL Loras"])
+        for number in range(1, rows + 1):
+            tags = ", ".join(rng.sample(WORDS, 6))
+            lora = f"<lora:style_{rng.randrange(300)}:{rng.choice(['0.6', '0.8', '1.0'])}>"
+            name = f"Style {number}" if encoding == "utf-8" or number % 97 else f"Café ’{number}’"
+            writer.writerow([number, name, f"a detailed photo of subject {number}, {tags} {lora}",
+                             "blurry, lowres, watermark", lora, ""])
+
+
+def percentiles(samples):
+    ordered = sorted(samples)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    return statistics.median(ordered), pick(0.95), pick(0.99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000, 10_000, 100_000, 500_000])
+    parser.add_argument("--encodings", nargs="+", default=ENCODINGS)
+    parser.add_argument("--warm", type=int, default=200, help="warm calls per node")
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args()
+
+    install_stubs()
+    sys.path.insert(0, ROOT)
+    os.makedirs(STYLES_DIR, exist_ok=True)
+
+    from nodes import moser_styles_full, moser_styles_loader, prompt_mixer, value_override
+    from nodes import style_cache, style_index
+
+    # Keep the benchmark's index files and state writes out of the repo
+    style_index.INDEX_DIR = os.path.join(WORK_DIR, "style_index")
+    moser_styles_full.persistent_state.path = os.path.join(WORK_DIR, "moser_styles_full_data.json")
+
+    rng = random.Random(args.seed)
+    loader = moser_styles_loader.MoserStylesLoader()
+    full = moser_styles_full.MoserStylesFull()
+    mixer = prompt_mixer.MoserPromptMixer()
+    override = value_override.ValueOverrideNode()
+
+    def cases(name, rows):
+        return [
+            ("MoserStylesLoader", lambda n: loader.load_style(name, str(n))),
+            ("MoserStylesFull", lambda n: full.load_style(name, "Manual", 1, n, 1, rows)),
+            ("MoserPromptMixer", lambda n: mixer.mix_prompts(name, n, rows + 1 - n, 5, seed=n)),
+            ("Mixer co-occur", lambda n: mixer.mix_prompts(name, n, rows + 1 - n, 5, seed=n, tag_mode="Co-occurrence")),
+            ("ValueOverrideNode", lambda n: override.get_value(name, n - 1, "Positive")),
+        ]
+
+    def reset(path):
+        style_cache.invalidate()
+        style_index.invalidate(path)
+        shutil.rmtree(style_index.INDEX_DIR, ignore_errors=True)
+
+    print(f"{'rows':>8} {'encoding':<13} {'node':<18} {'cold ms':>9} {'peak MB':>8} "
+          f"{'warm p50':>9} {'p95':>8} {'p99':>8}")
+    try:
+        for rows in args.rows:
+            for encoding in args.encodings:
+                name = f"bench_{rows}_{encoding}.csv"
+                path = os.path.join(STYLES_DIR, name)
+                make_csv(path, rows, encoding, rng)
+                for node, call in cases(name, rows):
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        reset(path)
+                        start = time.perf_counter()
+                        call(rng.randint(1, rows))
+                        cold = time.perf_counter() - start
+
+                        # Peak memory of a cold call, measured separately since tracing slows it down
+                        reset(path)
+                        tracemalloc.start()
+                        call(rng.randint(1, rows))
+                        peak = tracemalloc.get_traced_memory()[1]
+                        tracemalloc.stop()
+
+                        warm = []
+                        for _ in range(args.warm):
+                            number = rng.randint(1, rows)
+                            start = time.perf_counter()
+                            call(number)
+                            warm.append(time.perf_counter() - start)
+
+                    p50, p95, p99 = percentiles(warm)
+                    print(f"{rows:>8} {encoding:<13} {node:<18} {cold * 1e3:>9.2f} {peak / 1e6:>8.1f} "
+                          f"{p50 * 1e3:>9.3f} {p95 * 1e3:>8.3f} {p99 * 1e3:>8.3f}")
+                os.remove(path)
+        print(f"style cache: {style_cache.stats()}")
+    finally:
+        moser_styles_full.persistent_state.flush()
+        shutil.rmtree(WORK_DIR, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -40,7 +40,10 @@ const calculateNextNumber = (mode, currentValue, min, max) => {
     }
 };
 
-const handleExecutionStart = async (node) => {
+// Resolvers for the next_prompt the backend reports, by node id
+const pendingNextPrompts = new Map();
+
+const handleExecutionStart = async (node, backendNext) => {
     console.log("=== TRIGGER: Node Execution ===");
     const widgets = {
         current: node.widgets.find(w => w.name === "previous_prompt"),
@@ -60,13 +63,20 @@ const handleExecutionStart = async (node) => {
     await updateWidget(widgets.current, widgets.current.value, widgets.next.value);
 
     if (widgets.mode.value !== "Manual") {
-        console.log("Calculating next number");
-        const newNext = calculateNextNumber(
-            widgets.mode.value,
-            widgets.current.value,
-            widgets.min.value,
-            widgets.max.value
-        );
+        let newNext = null;
+        if (["Increment", "Decrement"].includes(widgets.mode.value)) {
+            // The backend knows the next existing prompt number, so gaps are skipped
+            newNext = await backendNext;
+        }
+        if (newNext === null || newNext === undefined) {
+            console.log("Calculating next number");
+            newNext = calculateNextNumber(
+                widgets.mode.value,
+                widgets.current.value,
+                widgets.min.value,
+                widgets.max.value
+            );
+        }
         await updateWidget(widgets.next, widgets.next.value, newNext);
     }
 };
@@ -110,18 +120,39 @@ app.registerExtension({
         if (nodeData.name === "MoserStylesFull") {
             // Set up event listeners for node execution
             api.addEventListener("executing", (e) => {
+                const executingId = e.detail ? Number(e.detail) : null;
+                // Another node starting, or the prompt finishing, means a node still
+                // waiting never reported a next_prompt, let it fall back to counting
+                for (const [nodeId, resolve] of pendingNextPrompts) {
+                    if (nodeId !== executingId) {
+                        pendingNextPrompts.delete(nodeId);
+                        resolve(null);
+                    }
+                }
                 if (e.detail) {
                     const node = app.graph._nodes.find(n => 
-                        n.type === "MoserStylesFull" && n.id === Number(e.detail)
+                        n.type === "MoserStylesFull" && n.id === executingId
                     );
                     if (node) {
                         console.log(`Moser Styles Full node (ID: ${e.detail}) has begun execution`);
+                        const backendNext = new Promise(resolve => pendingNextPrompts.set(node.id, resolve));
                         // Use a shorter delay and add retry logic for better reliability
-                        setTimeout(() => handleExecutionStart(node), 100);
+                        setTimeout(() => handleExecutionStart(node, backendNext), 100);
                     }
                 }
             });
 
+            // Only hand the backend's next_prompt to handleExecutionStart, which is the
+            // one place that writes the widgets, whichever event arrives first
+            api.addEventListener("executed", (e) => {
+                const nodeId = Number(e.detail?.node);
+                const resolve = pendingNextPrompts.get(nodeId);
+                if (resolve) {
+                    pendingNextPrompts.delete(nodeId);
+                    resolve(e.detail?.output?.next_prompt?.[0] ?? null);
+                }
+            });
+
             // Handle widget setup for both initial load and new nodes
             const onNodeCreated = nodeType.prototype.onNodeCreated;
             nodeType.prototype.onNodeCreated = function() {
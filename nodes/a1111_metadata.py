@@ -0,0 +1,77 @@
+import json
+from functools import lru_cache
+
+# A1111 style "parameters" text for the image savers.
+#
+# CivitaiImageSaver and SaveImageWithMetadata write the same format. Most of
+# it is the same from one save to the next (prompts, sampler, models, the
+# Hashes JSON), so those parts are built once per distinct input and cached,
+# and only the seed and size are filled in on each call.
+
+CACHE_SIZE = 256
+
+CIVITAI_SAMPLER_MAP = {
+    'euler_ancestral': 'Euler a',
+    'euler': 'Euler',
+    'lms': 'LMS',
+    'heun': 'Heun',
+    'dpm_2': 'DPM2',
+    'dpm_2_ancestral': 'DPM2 a',
+    'dpmpp_2s_ancestral': 'DPM++ 2S a',
+    'dpmpp_2m': 'DPM++ 2M',
+    'dpmpp_sde': 'DPM++ SDE',
+    'dpmpp_2m_sde': 'DPM++ 2M SDE',
+    'dpmpp_3m_sde': 'DPM++ 3M SDE',
+    'dpm_fast': 'DPM fast',
+    'dpm_adaptive': 'DPM adaptive',
+    'ddim': 'DDIM',
+    'plms': 'PLMS',
+    'uni_pc_bh2': 'UniPC',
+    'uni_pc': 'UniPC',
+    'lcm': 'LCM',
+}
+
+
+def handle_whitespace(string):
+    return string.strip().replace("\n", " ").replace("\r", " ").replace("\t", " ")
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def civitai_sampler_name(sampler_name, scheduler):
+    if sampler_name in CIVITAI_SAMPLER_MAP:
+        civitai_name = CIVITAI_SAMPLER_MAP[sampler_name]
+        if scheduler == "karras":
+            civitai_name += " Karras"
+        elif scheduler == "exponential":
+            civitai_name += " Exponential"
+        return civitai_name
+    return f"{sampler_name}_{scheduler}" if scheduler != 'normal' else sampler_name
+
+
+@lru_cache(maxsize=CACHE_SIZE, typed=True)
+def _head(positive, negative, steps, sampler_name, scheduler, cfg):
+    sampler = civitai_sampler_name(sampler_name.replace('_gpu', ''), scheduler)
+    return (f"{handle_whitespace(positive)}\nNegative prompt: {handle_whitespace(negative)}\n"
+            f"Steps: {steps}, Sampler: {sampler}, CFG scale: {cfg}, ")
+
+
+@lru_cache(maxsize=CACHE_SIZE, typed=True)
+def _tail(models, skip_unhashed_models, embeddings, loras, model_hash):
+    model_block = ", ".join(f"Model hash: {hash_value}, Model: {name}"
+                            for hash_value, name in models if hash_value or not skip_unhashed_models)
+    hashes = json.dumps(dict(embeddings) | dict(loras) | {"model": model_hash})
+    return f", {model_block}, Hashes: {hashes}, Version: ComfyUI"
+
+
+def build_params(positive, negative, steps, sampler_name, scheduler, cfg, seed, width, height,
+                 models, embeddings, loras, model_hash, skip_unhashed_models=False):
+    """The A1111 parameters text.
+
+    models is a list of (hash, name) pairs for the "Model hash: ..., Model: ..."
+    block, skipping the ones without a hash if skip_unhashed_models is set.
+    embeddings and loras are the PromptMetadataExtractor dicts, merged with
+    model_hash into the Hashes JSON.
+    """
+    head = _head(positive, negative, steps, sampler_name, scheduler, cfg)
+    tail = _tail(tuple(models), skip_unhashed_models, tuple(embeddings.items()), tuple(loras.items()), model_hash)
+    return f"{head}Seed: {seed}, Size: {width}x{height}{tail}"
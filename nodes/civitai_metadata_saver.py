@@ -15,32 +15,14 @@ logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 # Import from local files
+from . import a1111_metadata, hash_service, model_paths
 from .prompt_metadata_extractor import PromptMetadataExtractor
 from .utils import get_sha256, civitai_embedding_key_name, civitai_lora_key_name, full_embedding_path_for, full_lora_path_for
 
 class CivitaiImageSaver:
     def __init__(self):
         self.output_dir = folder_paths.output_directory
-        self.civitai_sampler_map = {
-            'euler_ancestral': 'Euler a',
-            'euler': 'Euler',
-            'lms': 'LMS',
-            'heun': 'Heun',
-            'dpm_2': 'DPM2',
-            'dpm_2_ancestral': 'DPM2 a',
-            'dpmpp_2s_ancestral': 'DPM++ 2S a',
-            'dpmpp_2m': 'DPM++ 2M',
-            'dpmpp_sde': 'DPM++ SDE',
-            'dpmpp_2m_sde': 'DPM++ 2M SDE',
-            'dpmpp_3m_sde': 'DPM++ 3M SDE',
-            'dpm_fast': 'DPM fast',
-            'dpm_adaptive': 'DPM adaptive',
-            'ddim': 'DDIM',
-            'plms': 'PLMS',
-            'uni_pc_bh2': 'UniPC',
-            'uni_pc': 'UniPC',
-            'lcm': 'LCM',
-        }
+        self.civitai_sampler_map = a1111_metadata.CIVITAI_SAMPLER_MAP
 
     @classmethod
     def INPUT_TYPES(cls):
@@ -93,10 +75,11 @@ class CivitaiImageSaver:
         timestamp = datetime.now().strftime(time_format)
         filename = f"{timestamp}_{Checkpoint.split('.')[0]}_{seed_value}"
 
-        ckpt_path = folder_paths.get_full_path("checkpoints", Checkpoint)
+        ckpt_path = model_paths.resolve("checkpoints", Checkpoint)
 
-        modelhash = self.get_sha256(ckpt_path)[:10] if ckpt_path else ""
-        logger.debug(f"Model hash: {modelhash}")
+        # Hash the checkpoint on a worker while the images are converted
+        model_hash_future = hash_service.submit(ckpt_path) if ckpt_path else None
+        pil_images = [Image.fromarray(np.clip(255. * image.cpu().numpy(), 0, 255).astype(np.uint8)) for image in images]
 
         metadata_extractor = PromptMetadataExtractor([positive, negative])
         embeddings = metadata_extractor.get_embeddings()
@@ -104,18 +87,14 @@ class CivitaiImageSaver:
         logger.debug(f"Extracted embeddings: {embeddings}")
         logger.debug(f"Extracted LoRAs: {loras}")
 
-        civitai_sampler_name = self.get_civitai_sampler_name(Sampler.replace('_gpu', ''), Scheduler)
-        logger.debug(f"Civitai sampler name: {civitai_sampler_name}")
-
-        extension_hashes = json.dumps(embeddings | loras | {"model": modelhash})
-        logger.debug(f"Extension hashes: {extension_hashes}")
+        modelhash = model_hash_future.result()[:10] if model_hash_future else ""
+        logger.debug(f"Model hash: {modelhash}")
 
         basemodelname = self.parse_checkpoint_name_without_extension(Checkpoint)
         logger.debug(f"Base model name: {basemodelname}")
 
-        positive_a111_params = self.handle_whitespace(positive)
-        negative_a111_params = f"\nNegative prompt: {self.handle_whitespace(negative)}"
-        a111_params = f"{positive_a111_params}{negative_a111_params}\nSteps: {steps}, Sampler: {civitai_sampler_name}, CFG scale: {cfg}, Seed: {seed_value}, Size: {width}x{height}, Model hash: {modelhash}, Model: {basemodelname}, Hashes: {extension_hashes}, Version: ComfyUI"
+        a111_params = a1111_metadata.build_params(positive, negative, steps, Sampler, Scheduler, cfg, seed_value, width, height,
+                                                  [(modelhash, basemodelname)], embeddings, loras, modelhash)
         logger.debug(f"A1111 parameters: {a111_params}")
 
         output_path = os.path.join(self.output_dir, path)
@@ -125,16 +104,15 @@ class CivitaiImageSaver:
                 logger.info(f'The path `{output_path.strip()}` specified doesn\'t exist! Creating directory.')
                 os.makedirs(output_path, exist_ok=True)
 
-        filenames = self.save_images(images, output_path, filename, a111_params, extension, quality_jpeg_or_webp, lossless_webp, optimize_png, prompt, extra_pnginfo, save_workflow_as_json, embed_workflow_in_png)
+        filenames = self.save_images(pil_images, output_path, filename, a111_params, extension, quality_jpeg_or_webp, lossless_webp, optimize_png, prompt, extra_pnginfo, save_workflow_as_json, embed_workflow_in_png)
 
         subfolder = os.path.normpath(path)
         return {"ui": {"images": [{"filename": filename, "subfolder": subfolder if subfolder != '.' else '', "type": 'output'} for filename in filenames]}}
 
     def save_images(self, images, output_path, filename_prefix, a111_params, extension, quality_jpeg_or_webp, lossless_webp, optimize_png, prompt, extra_pnginfo, save_workflow_as_json, embed_workflow_in_png):
         paths = []
-        for i, image in enumerate(images):
-            img = Image.fromarray(np.clip(255. * image.cpu().numpy(), 0, 255).astype(np.uint8))
-            current_filename_prefix = f"{filename_prefix}_{i+1:02d}" if images.shape[0] > 1 else filename_prefix
+        for i, img in enumerate(images):
+            current_filename_prefix = f"{filename_prefix}_{i+1:02d}" if len(images) > 1 else filename_prefix
 
             if extension == 'png':
                 metadata = PngInfo()
@@ -165,15 +143,7 @@ class CivitaiImageSaver:
         return paths
 
     def get_civitai_sampler_name(self, sampler_name, scheduler):
-        if sampler_name in self.civitai_sampler_map:
-            civitai_name = self.civitai_sampler_map[sampler_name]
-            if scheduler == "karras":
-                civitai_name += " Karras"
-            elif scheduler == "exponential":
-                civitai_name += " Exponential"
-            return civitai_name
-        else:
-            return f"{sampler_name}_{scheduler}" if scheduler != 'normal' else sampler_name
+        return a1111_metadata.civitai_sampler_name(sampler_name, scheduler)
 
     @staticmethod
     def make_filename(filename, seed, modelname, counter, time_format, sampler_name, steps, cfg, scheduler, denoise):
@@ -213,7 +183,7 @@ class CivitaiImageSaver:
 
     @staticmethod
     def handle_whitespace(string):
-        return string.strip().replace("\n", " ").replace("\r", " ").replace("\t", " ")
+        return a1111_metadata.handle_whitespace(string)
 
     @staticmethod
     def get_sha256(filename):
@@ -0,0 +1,44 @@
+import hashlib
+import os
+import threading
+
+# Fast whole-file hashing for model files.
+#
+# Files are read with readinto() into one large buffer per thread and handed to
+# hashlib through a memoryview, so there is no per-chunk allocation or copy.
+# hashlib releases the GIL while it digests buffers this size, which lets
+# several files hash in parallel on separate threads at close to disk speed.
+
+CHUNK_BYTES = 8 * 1024 * 1024
+
+_buffers = threading.local()
+
+
+def _buffer(size):
+    buffer = getattr(_buffers, "buffer", None)
+    if buffer is None or len(buffer) != size:
+        buffer = _buffers.buffer = bytearray(size)
+    return buffer
+
+
+def hash_file(path, algorithm="sha256", progress=None, chunk_bytes=CHUNK_BYTES):
+    """Hex digest of the file at path.
+
+    progress(done, total) is called after every chunk with the bytes hashed so
+    far and the file size.
+    """
+    digest = hashlib.new(algorithm)
+    buffer = _buffer(chunk_bytes)
+    view = memoryview(buffer)
+    done = 0
+    with open(path, "rb", buffering=0) as f:
+        total = os.fstat(f.fileno()).st_size
+        while True:
+            n = f.readinto(buffer)
+            if not n:
+                break
+            digest.update(view[:n])
+            done += n
+            if progress is not None:
+                progress(done, total)
+    return digest.hexdigest()
@@ -0,0 +1,24 @@
+import os
+
+# Permissions for files written through tempfile.mkstemp.
+#
+# mkstemp creates its file with mode 0600 whatever the umask, so a file renamed
+# over its destination would end up readable by its owner only. Writers chmod
+# the temporary file to the mode open() would have given it before renaming.
+
+# The umask can only be read by setting it, so do that once while importing
+_UMASK = os.umask(0o022)
+os.umask(_UMASK)
+
+
+def default_mode():
+    """Mode a new file gets from open() under the process umask"""
+    return 0o666 & ~_UMASK
+
+
+def mode_for(path):
+    """Mode to give a replacement for path, its current one if it exists"""
+    try:
+        return os.stat(path).st_mode & 0o7777
+    except OSError:
+        return default_mode()
@@ -0,0 +1,120 @@
+import os
+import sqlite3
+import threading
+import time
+
+from . import hash_sidecars
+
+# Persistent cache of model file hashes.
+#
+# Hashing a multi-gigabyte checkpoint on every save is what made the metadata
+# savers slow, so full-file hashes are kept in a SQLite database keyed by the
+# file's real path and validated against its size, mtime and inode. The
+# database runs in WAL mode with a busy timeout, which lets several ComfyUI
+# processes on the same machine read and write it at once; point them at the
+# same file with MOSER_HASH_CACHE to share it between installs.
+#
+# A hash is looked for in memory, then in the database, then in a sidecar file
+# another tool left next to the model (see hash_sidecars.py). Only if all of
+# them miss is the file read in full.
+
+DB_PATH = os.environ.get("MOSER_HASH_CACHE") or os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), "data", "hash_cache.sqlite3")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS hashes (
+    path TEXT NOT NULL,
+    algorithm TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    digest TEXT NOT NULL,
+    hashed_at REAL NOT NULL,
+    PRIMARY KEY (path, algorithm)
+);
+"""
+
+
+def file_key(path):
+    """(realpath, size, mtime_ns, inode) identifying the current contents of path"""
+    real = os.path.realpath(path)
+    stat = os.stat(real)
+    return (real, stat.st_size, stat.st_mtime_ns, stat.st_ino)
+
+
+class HashCache:
+    def __init__(self, db_path=DB_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+        # (file_key, algorithm) -> digest, for this process
+        self._memory = {}
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def lookup(self, key, algorithm="sha256"):
+        """Cached digest for key, or None if missing or the file changed since"""
+        row = self._connect().execute(
+            "SELECT size, mtime_ns, inode, digest FROM hashes WHERE path = ? AND algorithm = ?",
+            (key[0], algorithm)).fetchone()
+        if row is not None and tuple(row[:3]) == key[1:]:
+            return row[3]
+        return None
+
+    def store(self, key, digest, algorithm="sha256"):
+        conn = self._connect()
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO hashes (path, algorithm, size, mtime_ns, inode, digest, hashed_at) "
+                         "VALUES (?, ?, ?, ?, ?, ?, ?)", (key[0], algorithm, *key[1:], digest, time.time()))
+
+    def get(self, path, compute, algorithm="sha256"):
+        """Digest of path, calling compute(path) only if no cache or sidecar has it"""
+        key = file_key(path)
+        digest = self._memory.get((key, algorithm))
+        if digest is not None:
+            return digest
+
+        try:
+            digest = self.lookup(key, algorithm)
+        except sqlite3.Error as e:
+            print(f"Error reading hash cache {self.db_path}: {e}")
+        if digest is not None:
+            self._memory[(key, algorithm)] = digest
+            return digest
+
+        if algorithm == "sha256":
+            digest = hash_sidecars.read_sha256(key[0], key[1], key[2])
+        if digest is None:
+            digest = compute(path)
+            # Don't remember a hash of a file that changed while we read it
+            if file_key(path) != key:
+                return digest
+            if algorithm == "sha256" and hash_sidecars.WRITE_SIDECARS:
+                hash_sidecars.write_sha256(key[0], digest)
+
+        self._memory[(key, algorithm)] = digest
+        try:
+            self.store(key, digest, algorithm)
+        except sqlite3.Error as e:
+            print(f"Error writing hash cache {self.db_path}: {e}")
+        return digest
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = HashCache()
+        return _cache
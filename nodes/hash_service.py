@@ -0,0 +1,91 @@
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from . import hash_cache, utils
+
+# Model hashes as futures, for the savers.
+#
+# A saver asks for the hashes it needs before it converts its images, so the
+# hashing (or the cache lookup) runs on a worker thread while the pixels are
+# encoded. Requests for a file that is already being hashed get the same
+# future, so two savers on the same checkpoint only read it once.
+#
+# Each device gets its own pool. Parallel reads pay off on SSDs and network
+# shares, but on a spinning disk they only add seeks, so files on a disk Linux
+# reports as rotational are hashed one at a time.
+
+WORKERS = max(1, int(os.environ.get("MOSER_HASH_WORKERS", "4")))
+
+
+def is_rotational(path):
+    """True if path is on a spinning disk, as far as the OS tells us"""
+    try:
+        device = os.stat(path).st_dev
+        block = f"/sys/dev/block/{os.major(device)}:{os.minor(device)}"
+    except (OSError, AttributeError):
+        return False
+    # Partitions keep the queue settings on their parent disk
+    for queue in (f"{block}/queue/rotational", f"{block}/../queue/rotational"):
+        try:
+            with open(queue) as f:
+                return f.read().strip() == "1"
+        except OSError:
+            continue
+    return False
+
+
+class HashService:
+    def __init__(self, workers=WORKERS):
+        self.workers = workers
+        self._lock = threading.Lock()
+        # st_dev -> ThreadPoolExecutor for files on that device
+        self._pools = {}
+        # hash_cache.file_key -> Future of the running hash
+        self._pending = {}
+
+    def _pool_for(self, device, path):
+        pool = self._pools.get(device)
+        if pool is None:
+            workers = 1 if is_rotational(path) else self.workers
+            pool = self._pools[device] = ThreadPoolExecutor(workers, thread_name_prefix="MoserHash")
+        return pool
+
+    def submit(self, path):
+        """Future of the full sha256 of path, shared with any running request for the same file"""
+        try:
+            key = hash_cache.file_key(path)
+            device = os.stat(key[0]).st_dev
+        except OSError as e:
+            future = Future()
+            future.set_exception(e)
+            return future
+        with self._lock:
+            future = self._pending.get(key)
+            if future is None:
+                future = self._pending[key] = self._pool_for(device, key[0]).submit(self._hash, key, path)
+            return future
+
+    def _hash(self, key, path):
+        try:
+            return utils.get_sha256(path)
+        finally:
+            # A request arriving after this gets a fresh future, served from the hash cache
+            with self._lock:
+                self._pending.pop(key, None)
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_service():
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = HashService()
+        return _service
+
+
+def submit(path):
+    return get_service().submit(path)
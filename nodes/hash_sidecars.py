@@ -0,0 +1,104 @@
+import json
+import os
+import re
+import tempfile
+
+from . import file_modes
+
+# Hash sidecar files next to model files.
+#
+# Other tools often leave the sha256 of a model beside it, either as a .sha256
+# file (a bare digest, or sha256sum output) or in the Civitai Helper
+# .civitai.info JSON. Reading one saves a full read of the model. A .sha256 file
+# only counts if it is at least as new as the model and, when it has the file
+# name field sha256sum writes, names this model; model.ckpt and
+# model.safetensors would otherwise share a model.sha256. A .civitai.info is often
+# older than the model it describes, so instead its entry has to match the
+# model's exact size (sizeKB is in fractional KB) and, if it names the file,
+# the file name too. With MOSER_WRITE_HASH_SIDECARS=1 a model.safetensors.sha256
+# in sha256sum format is written after each full hash, readable by other tools
+# and machines on the share.
+
+WRITE_SIDECARS = os.environ.get("MOSER_WRITE_HASH_SIDECARS", "").lower() in ("1", "true", "yes")
+
+SHA256 = re.compile(r"^[0-9a-fA-F]{64}$")
+# A bare digest, or sha256sum's "digest  name" (" *name" in binary mode)
+SHA256_LINE = re.compile(r"^([0-9a-fA-F]{64})(?:[ \t]+\*?(.*?))?\s*$")
+
+
+def _sha256_paths(path):
+    # model.safetensors.sha256 and model.sha256 are both in use, the first is what we write
+    return [path + ".sha256", os.path.splitext(path)[0] + ".sha256"]
+
+
+def _read_sha256_file(sidecar, path, mtime_ns):
+    try:
+        if os.stat(sidecar).st_mtime_ns < mtime_ns:
+            return None
+        with open(sidecar, "r", encoding="utf-8") as f:
+            line = f.readline(512)
+    except (OSError, UnicodeDecodeError):
+        return None
+    match = SHA256_LINE.match(line.strip())
+    if match is None:
+        return None
+    # sha256sum may have been run from another folder, so compare base names
+    name = match.group(2)
+    if name and os.path.basename(name.replace("\\", "/")) != os.path.basename(path):
+        return None
+    return match.group(1).lower()
+
+
+def _read_civitai_info(path, size):
+    sidecar = os.path.splitext(path)[0] + ".civitai.info"
+    try:
+        with open(sidecar, "r", encoding="utf-8") as f:
+            info = json.load(f)
+    except (OSError, ValueError):
+        return None
+    # Written by another tool, so anything of an unexpected shape is no match
+    if not isinstance(info, dict) or not isinstance(info.get("files"), list):
+        return None
+    name = os.path.basename(path)
+    for entry in info["files"]:
+        if not isinstance(entry, dict) or not isinstance(entry.get("hashes"), dict):
+            continue
+        digest = entry["hashes"].get("SHA256")
+        if not isinstance(digest, str) or not SHA256.match(digest):
+            continue
+        size_kb = entry.get("sizeKB")
+        if not isinstance(size_kb, (int, float)) or isinstance(size_kb, bool) or abs(size_kb * 1024 - size) >= 1:
+            continue
+        if entry.get("name") in (None, name):
+            return digest.lower()
+    return None
+
+
+def read_sha256(path, size, mtime_ns):
+    """sha256 of path from a sidecar file that still matches it, or None"""
+    for sidecar in _sha256_paths(path):
+        digest = _read_sha256_file(sidecar, path, mtime_ns)
+        if digest:
+            return digest
+    return _read_civitai_info(path, size)
+
+
+def write_sha256(path, digest):
+    """Write a sha256sum style .sha256 beside path"""
+    sidecar = _sha256_paths(path)[0]
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(sidecar), prefix=".", suffix=".tmp")
+    except OSError as e:
+        print(f"Unable to write hash sidecar {sidecar}: {e}")
+        return
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(f"{digest}  {os.path.basename(path)}\n")
+        os.chmod(tmp_path, file_modes.default_mode())
+        os.replace(tmp_path, sidecar)
+    except OSError as e:
+        print(f"Unable to write hash sidecar {sidecar}: {e}")
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
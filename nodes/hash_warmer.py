@@ -0,0 +1,161 @@
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import folder_paths
+from aiohttp import web
+from server import PromptServer
+
+from . import utils
+
+# Optional background pre-hashing of the model folders.
+#
+# Without it the first save after a restart hashes the checkpoint and every
+# LoRA in the prompt before the image is written. With MOSER_PREHASH=1 set,
+# the package __init__ starts a small pool of low-priority threads that walk
+# the checkpoints, loras and embeddings folders and fill the persistent hash
+# cache, so those saves find their hashes ready. Files already in the cache
+# cost one stat and a lookup. The warmer pauses between chunks whenever a
+# prompt is queued or running, and its progress is served at /moser/prehash.
+
+FOLDERS = ["checkpoints", "loras", "embeddings"]
+IDLE_POLL_SECONDS = 1.0
+
+
+# SetThreadPriority values, background mode lowers the thread's I/O priority too
+THREAD_MODE_BACKGROUND_BEGIN = 0x00010000
+THREAD_PRIORITY_LOWEST = -2
+
+
+def _lower_priority():
+    # On Linux niceness is per thread. On Windows the thread goes into
+    # background mode, or failing that the lowest priority. macOS has no per
+    # thread niceness, so there the priority is left alone.
+    if sys.platform.startswith("linux"):
+        try:
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19)
+        except (AttributeError, OSError):
+            pass
+    elif sys.platform == "win32":
+        try:
+            import ctypes
+            kernel32 = ctypes.windll.kernel32
+            thread = kernel32.GetCurrentThread()
+            if not kernel32.SetThreadPriority(thread, THREAD_MODE_BACKGROUND_BEGIN):
+                kernel32.SetThreadPriority(thread, THREAD_PRIORITY_LOWEST)
+        except (AttributeError, OSError):
+            pass
+
+
+def _prompts_pending():
+    try:
+        return PromptServer.instance.prompt_queue.get_tasks_remaining() > 0
+    except AttributeError:
+        return False
+
+
+class HashWarmer:
+    def __init__(self, folders=FOLDERS, workers=1):
+        self.folders = folders
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._thread = None
+        self.files_total = 0
+        self.files_done = 0
+        self.bytes_total = 0
+        self.bytes_done = 0
+        self.current = {}
+        self.paused = False
+        self.finished = False
+
+    def _model_files(self):
+        paths = {}
+        for folder in self.folders:
+            try:
+                names = folder_paths.get_filename_list(folder)
+            except KeyError:
+                continue
+            for name in names:
+                path = folder_paths.get_full_path(folder, name)
+                if path:
+                    paths.setdefault(os.path.realpath(path), path)
+        return list(paths.values())
+
+    def _wait_idle(self):
+        while _prompts_pending():
+            self.paused = True
+            time.sleep(IDLE_POLL_SECONDS)
+        self.paused = False
+
+    def _hash(self, path, size):
+        done = [0]
+
+        def progress(hashed, total):
+            with self._lock:
+                self.bytes_done += hashed - done[0]
+                self.current[path] = (hashed, total)
+            done[0] = hashed
+            self._wait_idle()
+
+        self._wait_idle()
+        try:
+            utils.get_sha256(path, progress)
+        except OSError as e:
+            print(f"Error pre-hashing {path}: {e}")
+        with self._lock:
+            # Cached files never reported progress, count them whole
+            self.bytes_done += size - done[0]
+            self.files_done += 1
+            self.current.pop(path, None)
+
+    def _run(self):
+        files = []
+        for path in self._model_files():
+            try:
+                files.append((path, os.path.getsize(path)))
+            except OSError:
+                continue
+        with self._lock:
+            self.files_total = len(files)
+            self.bytes_total = sum(size for _, size in files)
+
+        start = time.monotonic()
+        with ThreadPoolExecutor(self.workers, thread_name_prefix="MoserHashWarmer", initializer=_lower_priority) as pool:
+            list(pool.map(lambda item: self._hash(*item), files))
+        self.finished = True
+        print(f"Pre-hashed {len(files)} model files in {time.monotonic() - start:.1f}s")
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="MoserHashWarmer", daemon=True)
+        self._thread.start()
+
+    def progress(self):
+        with self._lock:
+            return {
+                "files_total": self.files_total,
+                "files_done": self.files_done,
+                "bytes_total": self.bytes_total,
+                "bytes_done": self.bytes_done,
+                "current": {path: {"done": done, "total": total} for path, (done, total) in self.current.items()},
+                "paused": self.paused,
+                "finished": self.finished,
+            }
+
+
+warmer = HashWarmer(workers=max(1, int(os.environ.get("MOSER_PREHASH_WORKERS", "1"))))
+
+
+@PromptServer.instance.routes.get("/moser/prehash")
+async def get_prehash_progress(request):
+    return web.json_response(warmer.progress())
+
+
+def start_from_env():
+    """Start the warmer if MOSER_PREHASH is set to 1, true or yes"""
+    if os.environ.get("MOSER_PREHASH", "").lower() in ("1", "true", "yes"):
+        warmer.start()
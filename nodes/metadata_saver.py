@@ -4,10 +4,10 @@ from PIL import Image
 from PIL.PngImagePlugin import PngInfo
 import torch
 import numpy as np
-import csv
 from pathlib import Path
 
 import folder_paths
+from . import style_cache
 
 class CCustomMetadataSaver:
     def __init__(self):
@@ -128,26 +128,11 @@ class MoserStylesLoader:
         input_dir = Path(folder_paths.base_path) / "styles"
         file_path = input_dir / csv_file
 
-        options = {}
-        encodings = ['utf-8', 'ISO-8859-1', 'utf-16', 'windows-1252']
-        for encoding in encodings:
-            try:
-                with open(file_path, encoding=encoding) as f:
-                    parsed = csv.reader(f)
-                    for row in parsed:
-                        name, positive, negative = (row + [None] * 3)[:3]
-                        name = name.strip() if name else None
-                        positive = positive.strip() if positive else ""
-                        negative = negative.strip() if negative else ""
-
-                        if name is not None:
-                            options[name] = (positive, negative)
-                break
-            except UnicodeDecodeError:
-                continue
-            except Exception as e:
-                print(f"Error reading file {file_path}: {str(e)}")
-                return ("", "")
+        try:
+            options = style_cache.load(file_path).view("metadata_saver_styles", _build_style_options, _extend_style_options)
+        except Exception as e:
+            print(f"Error reading file {file_path}: {str(e)}")
+            return ("", "")
 
         if style_name not in options:
             print(f"Style '{style_name}' not found in the selected CSV file")
@@ -155,6 +140,24 @@ class MoserStylesLoader:
 
         return options[style_name]
 
+def _build_style_options(style_file):
+    options = {}
+    _add_style_options(options, style_file.rows)
+    return options
+
+def _extend_style_options(options, style_file, start):
+    _add_style_options(options, style_file.rows[start:])
+
+def _add_style_options(options, rows):
+    for row in rows:
+        name, positive, negative = (row + [None] * 3)[:3]
+        name = name.strip() if name else None
+        positive = positive.strip() if positive else ""
+        negative = negative.strip() if negative else ""
+
+        if name is not None:
+            options[name] = (positive, negative)
+
 NODE_CLASS_MAPPINGS = {
     "CCustomMetadataSaver": CCustomMetadataSaver,
     "MoserStylesLoader": MoserStylesLoader,
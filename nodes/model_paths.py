@@ -0,0 +1,117 @@
+import os
+import threading
+import time
+
+import folder_paths
+
+# Index of model files by name, for resolving the names found in prompts.
+#
+# Resolving a <lora:...> tag used to os.walk every LoRA folder, which on a
+# large library on a network share took seconds per save. Each model folder
+# type is now walked once into a map of relative path and file name to full
+# path. Every CHECK_SECONDS at most, the next lookup stats the directories it
+# walked and rebuilds the map only if one of their mtimes changed, which
+# happens whenever a file or folder is added, removed or renamed in them.
+# Symlinked subfolders are walked too, each real directory once, and a name
+# the map doesn't have is still looked up with folder_paths.get_full_path.
+
+CHECK_SECONDS = 2.0
+
+
+def _key(name):
+    return os.path.normcase(name).replace("\\", "/")
+
+
+class ModelPathIndex:
+    def __init__(self, folder_name, check_seconds=CHECK_SECONDS):
+        self.folder_name = folder_name
+        self.check_seconds = check_seconds
+        self._lock = threading.Lock()
+        self._by_relpath = {}
+        self._by_name = {}
+        # Directory -> mtime_ns when walked, None until the first build
+        self._dirs = None
+        self._roots = []
+        self._checked = 0.0
+
+    def _folders(self):
+        try:
+            return list(folder_paths.get_folder_paths(self.folder_name))
+        except KeyError:
+            return []
+
+    def _build(self):
+        by_relpath, by_name, dirs = {}, {}, {}
+        roots = self._folders()
+        seen = set()
+        for root_dir in roots:
+            for root, subdirs, files in os.walk(root_dir, followlinks=True):
+                try:
+                    stat = os.stat(root)
+                except OSError:
+                    subdirs[:] = []
+                    continue
+                # A symlink back up the tree would otherwise be walked forever
+                if (stat.st_dev, stat.st_ino) in seen:
+                    subdirs[:] = []
+                    continue
+                seen.add((stat.st_dev, stat.st_ino))
+                dirs[root] = stat.st_mtime_ns
+                for name in files:
+                    path = os.path.join(root, name)
+                    # Earlier folders win, like folder_paths.get_full_path and the old walk
+                    by_relpath.setdefault(_key(os.path.relpath(path, root_dir)), path)
+                    by_name.setdefault(_key(name), path)
+        self._by_relpath, self._by_name, self._dirs, self._roots = by_relpath, by_name, dirs, roots
+
+    def _stale(self):
+        if self._folders() != self._roots:
+            return True
+        for root in self._roots:
+            # A model folder that didn't exist when we walked may exist now
+            if root not in self._dirs and os.path.isdir(root):
+                return True
+        for directory, mtime_ns in self._dirs.items():
+            try:
+                if os.stat(directory).st_mtime_ns != mtime_ns:
+                    return True
+            except OSError:
+                return True
+        return False
+
+    def _refresh(self):
+        if self._dirs is not None and time.monotonic() - self._checked < self.check_seconds:
+            return
+        if self._dirs is None or self._stale():
+            self._build()
+        self._checked = time.monotonic()
+
+    def resolve(self, name):
+        """Full path of the model file with this relative path or file name, or None"""
+        key = _key(name)
+        with self._lock:
+            self._refresh()
+            path = self._by_relpath.get(key) or self._by_name.get(key)
+        if path is None:
+            try:
+                path = folder_paths.get_full_path(self.folder_name, name)
+            except Exception:
+                path = None
+        return path
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_index(folder_name):
+    with _indexes_lock:
+        index = _indexes.get(folder_name)
+        if index is None:
+            index = _indexes[folder_name] = ModelPathIndex(folder_name)
+        return index
+
+
+def resolve(folder_name, name):
+    """Full path of a model in the folder_paths folder type, e.g. resolve("loras", "detail.safetensors")"""
+    return get_index(folder_name).resolve(name)
@@ -1,49 +1,33 @@
-import csv
-import json
-from pathlib import Path
-import folder_paths
+import bisect
 import os
 import re
+from aiohttp import web
+from server import PromptServer
+from . import state_store, style_cache, style_index, style_files, style_store
+from .moser_styles_loader import SOURCES
 
-class MoserStylesFull:
-    def __init__(self):
-        self.data_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
-        os.makedirs(self.data_dir, exist_ok=True)
-        self.json_path = os.path.join(self.data_dir, "moser_styles_full_data.json")
-        self.load_persistent_data()
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
+JSON_PATH = os.path.join(DATA_DIR, "moser_styles_full_data.json")
 
-    def load_persistent_data(self):
-        try:
-            with open(self.json_path, 'r') as f:
-                self.persistent_data = json.load(f)
-        except FileNotFoundError:
-            self.persistent_data = {
-                "current_number": 1,
-                "last_mode": None,
-                "last_min": 1,
-                "last_max": 100
-            }
-            self.save_persistent_data()
+persistent_state = state_store.open_store(JSON_PATH, {
+    "current_number": 1,
+    "last_mode": None,
+    "last_min": 1,
+    "last_max": 100
+})
 
-    def save_persistent_data(self):
-        with open(self.json_path, 'w') as f:
-            json.dump(self.persistent_data, f)
-        
-        web_json_path = os.path.join(folder_paths.base_path, "web", "moser_styles_full_data.json")
-        with open(web_json_path, 'w') as f:
-            json.dump(self.persistent_data, f)
+# Served from memory at the URL the old web/ copy of the file used to have
+@PromptServer.instance.routes.get("/moser_styles_full_data.json")
+async def get_persistent_data(request):
+    return web.json_response(persistent_state.data)
+
+class MoserStylesFull:
+    def __init__(self):
+        self.persistent_state = persistent_state
 
     @classmethod
     def INPUT_TYPES(cls):
-        input_dirs = [
-            Path(folder_paths.base_path) / "styles",
-            Path(r"C:\Users\rober\OneDrive\Documents\Sketchbook")
-        ]
-        
-        csv_files = []
-        for input_dir in input_dirs:
-            if input_dir.exists():
-                csv_files.extend([f.name for f in input_dir.glob("*.csv")])
+        csv_files = style_files.list_csv_files()
         
         if not csv_files: csv_files = [""]
 
@@ -55,6 +39,9 @@ class MoserStylesFull:
                 "next_prompt": ("INT", {"default": 1, "min": 1, "max": 9999}),
                 "minimum": ("INT", {"default": 1, "min": 1, "max": 9999}),
                 "maximum": ("INT", {"default": 100, "min": 1, "max": 9999}),
+            },
+            "optional": {
+                "source": (SOURCES, {"tooltip": "read the CSV directly or fetch from the SQLite style store"}),
             }
         }
 
@@ -67,86 +54,241 @@ class MoserStylesFull:
     def IS_CHANGED(cls, **kwargs):
         return float("NaN") if kwargs.get("mode") == "Random" else False
 
-    def load_style(self, prompt_file, mode, previous_prompt, next_prompt, minimum, maximum):
+    def load_style(self, prompt_file, mode, previous_prompt, next_prompt, minimum, maximum, source="CSV"):
         print(f"Executing node with Next Prompt value: {next_prompt}")
         if not prompt_file:
             return ("", "", "", "", "", 0, "")
 
-        # Define default PDXL prefixes
-        pdxl_positive_prefix = "score_9, score_8_up, score_8, score_7_up, score_7, RAW, photo, photorealistic, HD, dynamic lighting, masterpiece, rating_explicit, rating_questionable, (realistic:1.3),"
-        
-        pdxl_negative_prefix = "score_1, score_2, score_3, score_4, score_5, score_6, glitched, distorted, blurry face, low quality, bad quality, low-res, error, jpeg artefacts, cropped, poorly drawn, censored, text, signature, watermark, username, artist name, chibi, ugly face, ugly eyes, bad eyes, deformed eyes, cross-eyed, deformed, disfigured, bad anatomy, wrong anatomy, closed eyes, extra fingers, extra hands, bad hands, low detail, line art, monochrome, grayscale, face asymmetry, eyes asymmetry, multiple eyelids, deformed limbs, deformed body"
-
-        input_dirs = [
-            Path(folder_paths.base_path) / "styles",
-            Path(r"C:\Users\rober\OneDrive\Documents\Sketchbook")
-        ]
-        
-        file_path = next((p for d in input_dirs if d.exists() for p in [d / prompt_file] if p.exists()), None)
+        file_path = style_files.find_csv_file(prompt_file)
         if not file_path:
             return ("", "", "", "", "", 0, "")
 
-        options = {}
-        for encoding in ['utf-8', 'ISO-8859-1', 'utf-16', 'windows-1252']:
-            try:
-                with open(file_path, encoding=encoding) as f:
-                    for row in csv.DictReader(f):
-                        number = int(row.get("Number", "0").strip())
-                        if number:
-                            # Extract loras from positive prompt
-                            positive = row.get("Positive", "").strip()
-                            pdxl_positive = row.get("Positive", "").strip()
-                            pdxl_negative = row.get("Negative", "").strip()
-                            pdxl_loras = row.get("PDXL Loras", "").strip()
-                            
-                            # Find all lora entries in positive string
-                            lora_pattern = r'<lora:[^>]+>'
-                            loras = re.findall(lora_pattern, positive)
-                            
-                            # Remove loras from positive string
-                            for lora in loras:
-                                positive = positive.replace(lora, '')
-                            
-                            # Add found loras to PDXL loras
-                            if loras:
-                                pdxl_loras = pdxl_loras + ', ' + ', '.join(loras) if pdxl_loras else ', '.join(loras)
-                            
-                            # Clean up any double spaces and leading/trailing commas
-                            positive = ' '.join(positive.split())
-                            pdxl_loras = ' '.join(pdxl_loras.split()).strip(' ,')
-
-                            # Add prefixes to PDXL prompts
-                            pdxl_positive = f"{pdxl_positive_prefix}, {pdxl_positive}"
-                            pdxl_negative = f"{pdxl_negative_prefix}, {pdxl_negative}"
-
-                            options[number] = (
-                                positive,
-                                row.get("Negative", "").strip(),
-                                pdxl_positive,
-                                pdxl_negative,
-                                pdxl_loras,
-                                number,
-                                row.get("Name", "").strip()
-                            )
-                break
-            except UnicodeDecodeError:
-                continue
-            except Exception:
-                return ("", "", "", "", "", 0, "")
-
-        if not options:
+        try:
+            styles = _load_styles(file_path, source)
+            position = _select_position(styles, mode, next_prompt, minimum, maximum)
+            style = styles.style_at(position) if position is not None else None
+        except Exception:
+            return ("", "", "", "", "", 0, "")
+
+        if not style:
             return ("", "", "", "", "", 0, "")
 
-        self.persistent_data.update({
+        # Only written when something changed, and coalesced with other updates
+        self.persistent_state.update({
             "current_number": next_prompt,
             "last_mode": mode,
             "last_min": minimum,
             "last_max": maximum
         })
-        self.save_persistent_data()
 
-        closest_number = min(options.keys(), key=lambda x: abs(x - next_prompt))
-        return options.get(closest_number, ("", "", "", "", "", 0, ""))
+        if mode in STEP_MODES:
+            # Tell the widget which existing number comes next so it can skip gaps
+            step = STEP_MODES[mode]
+            following = style_cache.step_position(styles.numbers, style[5] + step, minimum, maximum, step, lo=styles.first)
+            if following is not None:
+                return {"ui": {"next_prompt": [styles.numbers[following]]}, "result": style}
+        return style
+
+class MoserStylesFullBatch:
+    """Load many styles in one execution, returned as lists"""
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        csv_files = style_files.list_csv_files()
+        
+        if not csv_files: csv_files = [""]
+
+        return {
+            "required": {
+                "prompt_file": (csv_files,),
+                "prompt_numbers": ("STRING", {"default": "1-10", "tooltip": "numbers and ranges, e.g. 1-100, 205, 310-320"}),
+            }
+        }
+
+    CATEGORY = "Moser"
+    RETURN_TYPES = MoserStylesFull.RETURN_TYPES
+    RETURN_NAMES = MoserStylesFull.RETURN_NAMES
+    OUTPUT_IS_LIST = (True,) * len(MoserStylesFull.RETURN_TYPES)
+    FUNCTION = "load_styles"
+
+    def load_styles(self, prompt_file, prompt_numbers):
+        empty = tuple([] for _ in self.RETURN_TYPES)
+        if not prompt_file:
+            return empty
+
+        file_path = style_files.find_csv_file(prompt_file)
+        if not file_path:
+            return empty
+
+        try:
+            ranges = _parse_number_ranges(prompt_numbers)
+        except ValueError:
+            print(f"Invalid prompt numbers: {prompt_numbers}")
+            return empty
+
+        try:
+            styles = _load_styles(file_path)
+            positions = []
+            for low, high in ranges:
+                # Only the numbers that exist in the file, found by bisect
+                start, stop = style_cache.range_positions(styles.numbers, low, high, lo=styles.first)
+                if start == stop and low == high:
+                    print(f"Prompt number {low} not found in {prompt_file}")
+                positions.extend(range(start, stop))
+            batch = [styles.style_at(position) for position in positions]
+        except Exception as e:
+            print(f"Error reading file {file_path}: {str(e)}")
+            return empty
+
+        return tuple(list(column) for column in zip(*batch)) if batch else empty
+
+RANGE_DASH = re.compile(r'\s*-\s*')
+
+def _parse_number_ranges(spec):
+    ranges = []
+    # "1 - 5" is one range, not three parts
+    for part in RANGE_DASH.sub("-", spec).replace(",", " ").split():
+        low, _, high = part.partition("-")
+        low = int(low)
+        high = int(high) if high else low
+        ranges.append((min(low, high), max(low, high)))
+    return ranges
+
+# Define default PDXL prefixes
+PDXL_POSITIVE_PREFIX = "score_9, score_8_up, score_8, score_7_up, score_7, RAW, photo, photorealistic, HD, dynamic lighting, masterpiece, rating_explicit, rating_questionable, (realistic:1.3),"
+
+PDXL_NEGATIVE_PREFIX = "score_1, score_2, score_3, score_4, score_5, score_6, glitched, distorted, blurry face, low quality, bad quality, low-res, error, jpeg artefacts, cropped, poorly drawn, censored, text, signature, watermark, username, artist name, chibi, ugly face, ugly eyes, bad eyes, deformed eyes, cross-eyed, deformed, disfigured, bad anatomy, wrong anatomy, closed eyes, extra fingers, extra hands, bad hands, low detail, line art, monochrome, grayscale, face asymmetry, eyes asymmetry, multiple eyelids, deformed limbs, deformed body"
+
+LORA_PATTERN = re.compile(r'(<lora:[^>]+>)')
+
+def _style_from_row(row):
+    number = int(row.get("Number", "0").strip())
+    if number:
+        # Extract loras from positive prompt
+        positive = row.get("Positive", "").strip()
+        pdxl_positive = row.get("Positive", "").strip()
+        pdxl_negative = row.get("Negative", "").strip()
+        pdxl_loras = row.get("PDXL Loras", "").strip()
+        
+        # Split lora entries out of the positive string in a single pass,
+        # the capture group leaves loras at the odd indexes
+        pieces = LORA_PATTERN.split(positive)
+        loras = pieces[1::2]
+        positive = ''.join(pieces[0::2])
+        
+        # Add found loras to PDXL loras
+        if loras:
+            pdxl_loras = pdxl_loras + ', ' + ', '.join(loras) if pdxl_loras else ', '.join(loras)
+        
+        # Clean up any double spaces and leading/trailing commas
+        positive = ' '.join(positive.split())
+        pdxl_loras = ' '.join(pdxl_loras.split()).strip(' ,')
+
+        # Add prefixes to PDXL prompts
+        pdxl_positive = f"{PDXL_POSITIVE_PREFIX}, {pdxl_positive}"
+        pdxl_negative = f"{PDXL_NEGATIVE_PREFIX}, {pdxl_negative}"
+
+        return (
+            positive,
+            row.get("Negative", "").strip(),
+            pdxl_positive,
+            pdxl_negative,
+            pdxl_loras,
+            number,
+            row.get("Name", "").strip()
+        )
+    return None
+
+class _CachedStyles:
+    """Styles parsed into memory, numbers kept sorted for binary search.
+
+    Only the Number column is read up front; the LoRA split and PDXL prefixes
+    are worked out the first time a style is selected and then kept.
+    """
+
+    def __init__(self, style_file):
+        self.records = {}
+        self._styles = {}
+        self._add(style_file.records())
+        self.numbers = sorted(number for number in self.records if number > 0)
+        self.first = 0
+
+    def _add(self, rows):
+        added = []
+        for row in rows:
+            number = int(row.get("Number", "0").strip())
+            if number:
+                if number in self.records:
+                    self._styles.pop(number, None)
+                else:
+                    added.append(number)
+                self.records[number] = row
+        return added
+
+    def extend(self, style_file, start):
+        """Take in rows appended to the file, keeping numbers sorted"""
+        for number in self._add(style_file.new_records(start)):
+            if number > 0:
+                if not self.numbers or number > self.numbers[-1]:
+                    self.numbers.append(number)
+                else:
+                    bisect.insort(self.numbers, number)
+
+    def style_at(self, position):
+        number = self.numbers[position]
+        style = self._styles.get(number)
+        if style is None:
+            style = self._styles[number] = _style_from_row(self.records[number])
+        return style
+
+class _IndexedStyles:
+    """Styles served from the compiled index, decoding only the selected row"""
+
+    def __init__(self, index):
+        self.index = index
+        self.numbers = index.numbers
+        # The index keeps every Number, skip anything below 1
+        self.first = bisect.bisect_left(self.numbers, 1)
+
+    def style_at(self, position):
+        return _style_from_row(self.index.record(self.index.row_for_position(position)))
+
+class _StoredStyles:
+    """Styles fetched by number from the SQLite style store"""
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.store = style_store.get_store()
+        self.numbers = self.store.numbers(file_path)
+        self.first = bisect.bisect_left(self.numbers, 1)
+
+    def style_at(self, position):
+        return _style_from_row(self.store.fetch(self.file_path, self.numbers[position]))
+
+def _load_styles(file_path, source="CSV"):
+    if source == "Style Store":
+        return _StoredStyles(file_path)
+    index = style_index.get_index(file_path)
+    if index is not None:
+        return _IndexedStyles(index)
+    return style_cache.load(file_path).view("styles_full", _CachedStyles, _CachedStyles.extend)
+
+STEP_MODES = {"Increment": 1, "Decrement": -1}
+
+def _select_position(styles, mode, target, minimum, maximum):
+    position = None
+    if mode in STEP_MODES:
+        # Jump to the next existing number in range instead of the nearest one
+        position = style_cache.step_position(styles.numbers, target, minimum, maximum, STEP_MODES[mode], lo=styles.first)
+    if position is None:
+        position = style_cache.nearest_position(styles.numbers, target, lo=styles.first)
+    return position
 
-NODE_CLASS_MAPPINGS = {"MoserStylesFull": MoserStylesFull}
-NODE_DISPLAY_NAME_MAPPINGS = {"MoserStylesFull": "Moser Styles Full"}
+NODE_CLASS_MAPPINGS = {
+    "MoserStylesFull": MoserStylesFull,
+    "MoserStylesFullBatch": MoserStylesFullBatch,
+}
+NODE_DISPLAY_NAME_MAPPINGS = {
+    "MoserStylesFull": "Moser Styles Full",
+    "MoserStylesFullBatch": "Moser Styles Full (Batch)",
+}
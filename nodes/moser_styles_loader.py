@@ -1,22 +1,14 @@
-import csv
-from pathlib import Path
-import folder_paths
 import os
+from . import style_cache, style_index, style_files, style_store
+
+SOURCES = ["CSV", "Style Store"]
 
 class MoserStylesLoader:
     """Load styles from a selected CSV file"""
 
     @classmethod
     def INPUT_TYPES(cls):
-        input_dirs = [
-            Path(folder_paths.base_path) / "styles",
-            Path(r"C:\Users\rober\OneDrive\Documents\Sketchbook")
-        ]
-        
-        csv_files = []
-        for input_dir in input_dirs:
-            if input_dir.exists():
-                csv_files.extend([f.name for f in input_dir.glob("*.csv")])
+        csv_files = style_files.list_csv_files()
         
         if not csv_files:
             print("No CSV files found in the styles folder or Sketchbook. Place at least one csv file in ComfyUI/styles/ or C:\\Users\\rober\\OneDrive\\Documents\\Sketchbook\\")
@@ -26,6 +18,9 @@ class MoserStylesLoader:
             "required": {
                 "csv_file": (csv_files,),
                 "style_number": ("STRING", {"default": ""}),
+            },
+            "optional": {
+                "source": (SOURCES, {"tooltip": "read the CSV directly or fetch from the SQLite style store"}),
             }
         }
 
@@ -35,49 +30,23 @@ class MoserStylesLoader:
     RETURN_NAMES = ("positive", "negative", "name", "number", "lora")
     FUNCTION = "load_style"
 
-    def load_style(self, csv_file, style_number):
+    def load_style(self, csv_file, style_number, source="CSV"):
         if not csv_file:
             print("No CSV file selected")
             return ("", "", "", "", "")
 
-        input_dirs = [
-            Path(folder_paths.base_path) / "styles",
-            Path(r"C:\Users\rober\OneDrive\Documents\Sketchbook")
-        ]
-        
-        file_path = None
-        for input_dir in input_dirs:
-            temp_path = input_dir / csv_file
-            if temp_path.exists():
-                file_path = temp_path
-                break
+        file_path = style_files.find_csv_file(csv_file)
 
         if not file_path:
             print(f"CSV file '{csv_file}' not found in any of the search directories.")
-            print(f"Searched directories: {[str(d) for d in input_dirs]}")
+            print(f"Searched directories: {[str(d) for d in style_files.STYLE_DIRS]}")
             return ("", "", "", "", "")
 
-        options = {}
-        encodings = ['utf-8', 'ISO-8859-1', 'utf-16', 'windows-1252']
-        for encoding in encodings:
-            try:
-                with open(file_path, encoding=encoding) as f:
-                    parsed = csv.DictReader(f)
-                    for row in parsed:
-                        number = row.get("Number", "").strip()
-                        name = row.get("Name", "").strip()
-                        positive = row.get("Positive", "").strip()
-                        negative = row.get("Negative", "").strip()
-                        lora = row.get("Lora", "").strip()  # New column for Lora
-
-                        if number:
-                            options[number] = (positive, negative, name, number, lora)
-                break
-            except UnicodeDecodeError:
-                continue
-            except Exception as e:
-                print(f"Error reading file {file_path}: {str(e)}")
-                return ("", "", "", "", "")  # Added an empty string for Lora
+        try:
+            options = _load_options(file_path, style_number, source)
+        except Exception as e:
+            print(f"Error reading file {file_path}: {str(e)}")
+            return ("", "", "", "", "")  # Added an empty string for Lora
 
         if style_number not in options:
             print(f"Style number '{style_number}' not found in the selected CSV file")
@@ -85,6 +54,73 @@ class MoserStylesLoader:
 
         return options[style_number]
 
+    @classmethod
+    def IS_CHANGED(cls, **kwargs):
+        # Linked inputs are missing or None here, see style_cache.file_digest
+        csv_file = kwargs.get("csv_file")
+        file_path = style_files.find_csv_file(csv_file) if csv_file else None
+        if not file_path:
+            return ""
+        style_number = kwargs.get("style_number")
+        if style_number is None:
+            return style_cache.file_digest(file_path)
+        source = kwargs.get("source") or "CSV"
+        try:
+            return style_cache.digest(_load_options(file_path, style_number, source).get(style_number))
+        except Exception:
+            return float("NaN")
+
+def _load_options(file_path, style_number, source):
+    # The index and the store only know integer Numbers; others, like "12a",
+    # are looked up in the parsed CSV so they work whatever the file size
+    try:
+        number = int(style_number)
+    except (TypeError, ValueError):
+        number = None
+    if number is not None:
+        if source == "Style Store":
+            return _options_from_store(file_path, number)
+        index = style_index.get_index(file_path)
+        if index is not None:
+            return _options_from_index(index, number)
+    return style_cache.load(file_path).view("styles_loader", _build_options, _extend_options)
+
+def _style_from_row(row):
+    number = row.get("Number", "").strip()
+    name = row.get("Name", "").strip()
+    positive = row.get("Positive", "").strip()
+    negative = row.get("Negative", "").strip()
+    lora = row.get("Lora", "").strip()  # New column for Lora
+
+    if number:
+        return (positive, negative, name, number, lora)
+    return None
+
+def _build_options(style_file):
+    options = {}
+    _add_options(options, style_file.records())
+    return options
+
+def _extend_options(options, style_file, start):
+    _add_options(options, style_file.new_records(start))
+
+def _add_options(options, rows):
+    for row in rows:
+        style = _style_from_row(row)
+        if style:
+            options[style[3]] = style
+
+def _options_from_index(index, number):
+    # Only decode the one row the index points at
+    row = index.find(number)
+    style = _style_from_row(index.record(row)) if row is not None else None
+    return {style[3]: style} if style else {}
+
+def _options_from_store(file_path, number):
+    row = style_store.get_store().fetch(file_path, number)
+    style = _style_from_row(row) if row is not None else None
+    return {style[3]: style} if style else {}
+
 NODE_CLASS_MAPPINGS = {
     "MoserStylesLoader": MoserStylesLoader,
 }
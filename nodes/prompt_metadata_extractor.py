@@ -1,14 +1,21 @@
 import re
+from functools import lru_cache
 from typing import List
 import logging
 import os
-from .utils import civitai_embedding_key_name, civitai_lora_key_name, full_embedding_path_for, full_lora_path_for, get_sha256
+from . import hash_service
+from .utils import civitai_embedding_key_name, civitai_lora_key_name, full_embedding_path_for, full_lora_path_for
 
 logger = logging.getLogger(__name__)
 
+SCAN_CACHE_SIZE = 1024
+
 class PromptMetadataExtractor:
     EMBEDDING = r'embedding:([^,\s\(\)\:]+)'
     LORA = r'<lora:([^>:]+)(?::[^>]+)?>'
+    # Both patterns in one pass, group 1 is an embedding and group 2 a LoRA. An
+    # embedding name stops at "<" here, or it would swallow a LoRA tag right after it
+    SCANNER = re.compile(r'embedding:([^,\s\(\)\:<]+)|' + LORA, re.IGNORECASE | re.MULTILINE)
 
     def __init__(self, prompts: List[str]):
         self.__embeddings = {}
@@ -22,41 +29,61 @@ class PromptMetadataExtractor:
         return self.__loras
 
     def __perform(self, prompts):
+        # Collect every resource first, in prompt order, so the hashes can run concurrently
+        embeddings = []
+        loras = []
         for prompt in prompts:
             logger.debug(f"Processing prompt: {prompt}")
-            embeddings = re.findall(self.EMBEDDING, prompt, re.IGNORECASE | re.MULTILINE)
-            for embedding in embeddings:
-                self.__extract_embedding_information(embedding)
-            
-            loras = re.findall(self.LORA, prompt, re.IGNORECASE | re.MULTILINE)
-            for lora in loras:
-                self.__extract_lora_information(lora)
-
-    def __extract_embedding_information(self, embedding: str):
-        logger.debug(f"Extracting embedding information for: {embedding}")
-        embedding_name = civitai_embedding_key_name(embedding)
-        embedding_path = full_embedding_path_for(embedding)
-        if embedding_path is None:
-            logger.warning(f"Embedding path not found for: {embedding}")
-            return
-        sha = self.__get_shortened_sha(embedding_path)
-        self.__embeddings[embedding_name] = sha
-        logger.debug(f"Added embedding: {embedding_name} with hash: {sha}")
-
-    def __extract_lora_information(self, lora: str):
-        logger.debug(f"Extracting LoRA information for: {lora}")
-        lora_name = civitai_lora_key_name(lora)
-        
-        # The lora name already includes the extension, so we don't need to add it
-        lora_path = full_lora_path_for(lora)
-        
-        if lora_path is None:
-            logger.warning(f"LoRA path not found for: {lora}")
-            return
-        
-        sha = self.__get_shortened_sha(lora_path)
-        self.__loras[lora_name] = sha
-        logger.debug(f"Added LoRA: {lora_name} with hash: {sha}")
-    
-    def __get_shortened_sha(self, file_path: str):
-       return get_sha256(file_path)[:10]
+            prompt_embeddings, prompt_loras = scan_prompt(prompt)
+            embeddings += [embedding for embedding in prompt_embeddings if embedding not in embeddings]
+            loras += [lora for lora in prompt_loras if lora not in loras]
+
+        pending = [(self.__embeddings, civitai_embedding_key_name(embedding), self.__submit_hash(embedding_path))
+                   for embedding, embedding_path in self.__embedding_paths(embeddings)]
+        pending += [(self.__loras, civitai_lora_key_name(lora), self.__submit_hash(lora_path))
+                    for lora, lora_path in self.__lora_paths(loras)]
+
+        # Filled in the order collected, which keeps the Hashes JSON stable
+        for resources, name, future in pending:
+            sha = future.result()[:10]
+            resources[name] = sha
+            logger.debug(f"Added {name} with hash: {sha}")
+
+    def __embedding_paths(self, embeddings):
+        for embedding in embeddings:
+            logger.debug(f"Extracting embedding information for: {embedding}")
+            embedding_path = full_embedding_path_for(embedding)
+            if embedding_path is None:
+                logger.warning(f"Embedding path not found for: {embedding}")
+                continue
+            yield embedding, embedding_path
+
+    def __lora_paths(self, loras):
+        for lora in loras:
+            logger.debug(f"Extracting LoRA information for: {lora}")
+            # The lora name already includes the extension, so we don't need to add it
+            lora_path = full_lora_path_for(lora)
+            if lora_path is None:
+                logger.warning(f"LoRA path not found for: {lora}")
+                continue
+            yield lora, lora_path
+
+    def __submit_hash(self, file_path: str):
+        # Cache hits come back at once, misses hash in parallel on the hash service's pool
+        return hash_service.submit(file_path)
+
+@lru_cache(maxsize=SCAN_CACHE_SIZE)
+def scan_prompt(prompt: str):
+    """Unique embeddings and LoRAs referenced in prompt, in order of appearance.
+
+    Batch saves and repeated styles pass the same prompt again and again, so
+    the results are memoized by prompt text.
+    """
+    embeddings = {}
+    loras = {}
+    for embedding, lora in PromptMetadataExtractor.SCANNER.findall(prompt):
+        if embedding:
+            embeddings[embedding] = None
+        elif lora:
+            loras[lora] = None
+    return tuple(embeddings), tuple(loras)
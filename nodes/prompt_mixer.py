@@ -1,22 +1,19 @@
-import csv
+import heapq
+import math
 import os
 import random
-import re
-from pathlib import Path
-import folder_paths
+import numpy as np
+from . import style_cache, style_files, tag_index
+from .prompt_tags import split_long_and_short
+
+# "Prompts" samples the short tags of the two prompts, "Co-occurrence" samples
+# tags found alongside them anywhere in the CSV
+TAG_MODES = ["Prompts", "Co-occurrence"]
 
 class MoserPromptMixer:
     @classmethod
     def INPUT_TYPES(cls):
-        input_dirs = [
-            Path(folder_paths.base_path) / "styles",
-            Path(r"C:\Users\rober\OneDrive\Documents\Sketchbook")
-        ]
-        
-        csv_files = []
-        for input_dir in input_dirs:
-            if input_dir.exists():
-                csv_files.extend([f.name for f in input_dir.glob("*.csv")])
+        csv_files = style_files.list_csv_files()
         
         if not csv_files:
             print("No CSV files found in the styles folder or Sketchbook. Place at least one csv file in ComfyUI/styles/ or C:\\Users\\rober\\OneDrive\\Documents\\Sketchbook\\")
@@ -31,112 +28,268 @@ class MoserPromptMixer:
             },
             "optional": {
                 "seed": ("INT", {"default": 0, "min": 0, "max": 0xffffffffffffffff}),
+                "count": ("INT", {"default": 1, "min": 1, "max": 1000, "tooltip": "number of distinct mixes to return"}),
+                "tag_mode": (TAG_MODES,),
             }
         }
 
     RETURN_TYPES = ("STRING", "STRING")
     RETURN_NAMES = ("mixed_prompt", "original_prompt")
+    OUTPUT_IS_LIST = (True, False)
     FUNCTION = "mix_prompts"
     CATEGORY = "Moser"
 
-    def mix_prompts(self, csv_file, prompt_number1, prompt_number2, num_tags, seed=0):
+    def mix_prompts(self, csv_file, prompt_number1, prompt_number2, num_tags, seed=0, count=1, tag_mode=TAG_MODES[0]):
         if not csv_file:
             print("No CSV file selected")
-            return ("", "")
+            return ([""], "")
 
-        # Set the random seed if provided
-        if seed != 0:
-            random.seed(seed)
+        # A private generator keeps the output reproducible for a seed without
+        # touching the global random state other nodes rely on
+        rng = random.Random(seed) if seed != 0 else random.Random()
 
-        input_dirs = [
-            Path(folder_paths.base_path) / "styles",
-            Path(r"C:\Users\rober\OneDrive\Documents\Sketchbook")
-        ]
-        
-        file_path = None
-        for input_dir in input_dirs:
-            temp_path = input_dir / csv_file
-            if temp_path.exists():
-                file_path = temp_path
-                break
+        file_path = style_files.find_csv_file(csv_file)
 
         if not file_path:
             print(f"CSV file '{csv_file}' not found in any of the search directories.")
-            print(f"Searched directories: {[str(d) for d in input_dirs]}")
-            return ("", "")
+            print(f"Searched directories: {[str(d) for d in style_files.STYLE_DIRS]}")
+            return ([""], "")
 
         prompts = self.load_prompts_from_csv(file_path)
         if not prompts:
-            return ("", "")
+            return ([""], "")
 
         if prompt_number1 not in prompts:
             print(f"Prompt number {prompt_number1} not found in the CSV file.")
-            return ("", "")
+            return ([""], "")
 
         if prompt_number2 not in prompts:
             print(f"Prompt number {prompt_number2} not found in the CSV file.")
-            return ("", "")
+            return ([""], "")
 
         current_prompt = prompts[prompt_number1]
         second_prompt = prompts[prompt_number2]
 
-        # Split prompts into long sections and short tags
-        long_sections, short_tags = self.split_long_and_short(current_prompt)
-        _, second_short_tags = self.split_long_and_short(second_prompt)
+        # Split prompts into long sections and short tags, cached per file version
+        long_sections, short_tags = prompts.split(prompt_number1)
+        _, second_short_tags = prompts.split(prompt_number2)
 
         # Combine short tags from both prompts
         all_short_tags = short_tags + second_short_tags
 
-        # Randomly select tags from short tags
-        selected_tags = random.sample(all_short_tags, min(num_tags, len(all_short_tags)))
+        if tag_mode == "Co-occurrence":
+            try:
+                index = tag_index.get_index(style_cache.load(file_path))
+            except Exception as e:
+                print(f"Error indexing tags of {file_path}: {str(e)}")
+                return ([""], "")
+            np_rng = np.random.default_rng(rng.getrandbits(64))
+            # One co-occurrence count over the whole file, shared by every mix
+            candidates = index.candidates(all_short_tags)
+            limit = math.comb(len(candidates[0]), min(num_tags, len(candidates[0])))
+        else:
+            limit = _max_distinct(all_short_tags, num_tags)
 
-        # Combine long sections and selected short tags
-        mixed_prompt = ", ".join(long_sections + selected_tags)
+        def mix():
+            if tag_mode == "Co-occurrence":
+                return index.sample(candidates, num_tags, np_rng)
+            # Randomly select tags from short tags
+            return rng.sample(all_short_tags, min(num_tags, len(all_short_tags)))
 
-        return (mixed_prompt, current_prompt)
+        # Combine long sections and selected short tags
+        mixes = [", ".join(long_sections + selected_tags) for selected_tags in distinct_mixes(mix, count, limit=limit)]
+        return (mixes, current_prompt)
 
     def load_prompts_from_csv(self, file_path):
-        prompts = {}
-        encodings = ['utf-8', 'ISO-8859-1', 'utf-16', 'windows-1252']
-        for encoding in encodings:
-            try:
-                with open(file_path, encoding=encoding) as f:
-                    reader = csv.DictReader(f)
-                    for row in reader:
-                        if 'Number' in row and 'Positive' in row:
-                            try:
-                                number = int(row['Number'])
-                                prompts[number] = row['Positive'].strip()
-                            except ValueError:
-                                print(f"Invalid number format in row: {row['Number']}")
-                return prompts
-            except UnicodeDecodeError:
-                continue
-            except Exception as e:
-                print(f"Error reading file {file_path}: {str(e)}")
-                return {}
-        print(f"Unable to read the CSV file with any of the attempted encodings.")
-        return {}
+        try:
+            return style_cache.load(file_path).view("prompt_mixer", _build_prompts, _extend_prompts)
+        except Exception as e:
+            print(f"Error reading file {file_path}: {str(e)}")
+            return {}
 
     def split_long_and_short(self, prompt):
-        # Split the prompt into sections
-        sections = [section.strip() for section in re.split(r',\s*', prompt) if section.strip()]
-        
-        # Separate long sections (more than 3 words) and short tags
-        long_sections = [section for section in sections if len(section.split()) > 3]
-        short_tags = [section for section in sections if len(section.split()) <= 3]
+        return split_long_and_short(prompt)
+
+    @classmethod
+    def IS_CHANGED(s, **kwargs):
+        # Linked inputs are missing or None here, see style_cache.file_digest
+        csv_file = kwargs.get("csv_file")
+        if kwargs.get("tag_mode") == "Co-occurrence":
+            # Tags are drawn from the whole file
+            return _prompts_digest(csv_file, None)
+        return _prompts_digest(csv_file, [kwargs.get("prompt_number1"), kwargs.get("prompt_number2")])
+
+class MoserPromptMixerN:
+    """Mix short tags pooled from any number of prompts, weighted per prompt"""
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        csv_files = style_files.list_csv_files()
         
-        return long_sections, short_tags
+        if not csv_files:
+            csv_files = [""]
+
+        return {
+            "required": {
+                "csv_file": (csv_files,),
+                "prompts": ("STRING", {"default": "1, 2", "multiline": True, "tooltip": "prompt numbers with optional weights, e.g. 12:2, 40, 77:0.5"}),
+                "num_tags": ("INT", {"default": 5, "min": 1, "max": 500, "step": 1}),
+            },
+            "optional": {
+                "seed": ("INT", {"default": 0, "min": 0, "max": 0xffffffffffffffff}),
+            }
+        }
+
+    RETURN_TYPES = ("STRING", "STRING")
+    RETURN_NAMES = ("mixed_prompt", "original_prompt")
+    FUNCTION = "mix_prompts"
+    CATEGORY = "Moser"
+
+    def mix_prompts(self, csv_file, prompts, num_tags, seed=0):
+        if not csv_file:
+            print("No CSV file selected")
+            return ("", "")
+
+        try:
+            weights = _parse_weights(prompts)
+        except ValueError:
+            print(f"Invalid prompt list: {prompts}")
+            return ("", "")
+        if not weights:
+            return ("", "")
+
+        file_path = style_files.find_csv_file(csv_file)
+        if not file_path:
+            print(f"CSV file '{csv_file}' not found in any of the search directories.")
+            return ("", "")
+
+        table = MoserPromptMixer().load_prompts_from_csv(file_path)
+        missing = [number for number, _ in weights if number not in table]
+        if missing:
+            print(f"Prompt numbers {missing} not found in the CSV file.")
+            return ("", "")
+
+        # Pool the short tags, a tag found in several prompts gets their combined weight
+        pool = {}
+        for number, weight in weights:
+            for tag in table.split(number)[1]:
+                pool[tag] = pool.get(tag, 0.0) + weight
+
+        rng = random.Random(seed) if seed != 0 else random.Random()
+        selected_tags = weighted_sample(pool, num_tags, rng)
+
+        first = weights[0][0]
+        mixed_prompt = ", ".join(table.split(first)[0] + selected_tags)
+        return (mixed_prompt, table[first])
 
     @classmethod
-    def IS_CHANGED(s, csv_file, prompt_number1, prompt_number2, num_tags, seed=0):
-        return float(prompt_number1) + float(prompt_number2) + float(num_tags) + float(seed)
+    def IS_CHANGED(s, **kwargs):
+        prompts = kwargs.get("prompts")
+        try:
+            numbers = None if prompts is None else [number for number, _ in _parse_weights(prompts)]
+        except ValueError:
+            return ""
+        return _prompts_digest(kwargs.get("csv_file"), numbers)
+
+def _prompts_digest(csv_file, numbers):
+    """Digest of the prompts a mix reads, so edits to other rows keep cached mixes.
+
+    numbers is None, or holds None, when they aren't known before the node
+    runs, and then the whole file counts.
+    """
+    file_path = style_files.find_csv_file(csv_file) if csv_file else None
+    if not file_path:
+        return ""
+    if numbers is None or None in numbers:
+        return style_cache.file_digest(file_path)
+    table = MoserPromptMixer().load_prompts_from_csv(file_path)
+    return style_cache.digest([table.get(number) for number in numbers])
+
+def distinct_mixes(mix, count, attempts_per_mix=10, limit=None):
+    """Call mix() until count distinct tag selections are found or attempts run out.
+
+    Selections with the same tags in another order are the same mix. limit is
+    how many distinct selections the pool allows, if known, so a small pool
+    stops as soon as it is exhausted.
+    """
+    if limit is not None:
+        count = min(count, max(limit, 1))
+    mixes = []
+    seen = set()
+    for _ in range(count * attempts_per_mix):
+        selected_tags = mix()
+        key = frozenset(selected_tags)
+        if key not in seen:
+            seen.add(key)
+            mixes.append(selected_tags)
+            if len(mixes) == count:
+                break
+    return mixes
+
+def _max_distinct(tags, k):
+    """How many distinct tag sets random.sample(tags, k) can give, with repeats in tags"""
+    k = min(k, len(tags))
+    distinct = len(set(tags))
+    repeats = len(tags) - distinct
+    return sum(math.comb(distinct, size) for size in range(max(k - repeats, 0), min(k, distinct) + 1))
+
+def weighted_sample(weights, k, rng):
+    """Pick k distinct keys of weights without replacement, proportional to weight.
+
+    Uses Efraimidis-Spirakis keys, so the cost is one random number per
+    candidate plus a heap of size k.
+    """
+    keyed = ((rng.random() ** (1.0 / weight), tag) for tag, weight in weights.items() if weight > 0)
+    return [tag for _, tag in heapq.nlargest(k, keyed)]
+
+def _parse_weights(spec):
+    weights = []
+    for part in spec.replace("\n", ",").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        number, _, weight = part.partition(":")
+        weights.append((int(number), float(weight) if weight else 1.0))
+    return weights
+
+class _PromptTable(dict):
+    """Positive prompts by number, with each prompt's long/short split cached"""
+
+    def __init__(self):
+        super().__init__()
+        self.splits = {}
+
+    def split(self, number):
+        split = self.splits.get(number)
+        if split is None:
+            split = self.splits[number] = split_long_and_short(self[number])
+        return split
+
+def _build_prompts(style_file):
+    prompts = _PromptTable()
+    _add_prompts(prompts, style_file.records())
+    return prompts
+
+def _extend_prompts(prompts, style_file, start):
+    _add_prompts(prompts, style_file.new_records(start))
+
+def _add_prompts(prompts, rows):
+    for row in rows:
+        if 'Number' in row and 'Positive' in row:
+            try:
+                number = int(row['Number'])
+                prompts[number] = row['Positive'].strip()
+                prompts.splits.pop(number, None)
+            except ValueError:
+                print(f"Invalid number format in row: {row['Number']}")
 
 # Add custom node mappings
 NODE_CLASS_MAPPINGS = {
     "MoserPromptMixer": MoserPromptMixer,
+    "MoserPromptMixerN": MoserPromptMixerN,
 }
 
 NODE_DISPLAY_NAME_MAPPINGS = {
     "MoserPromptMixer": "Moser Prompt Mixer",
+    "MoserPromptMixerN": "Moser Prompt Mixer (N-way)",
 }
@@ -0,0 +1,18 @@
+import re
+
+# Splitting a prompt into its long sections and short tags, shared by the
+# prompt mixer and the tag index.
+
+SECTION_SPLIT = re.compile(r',\s*')
+
+def split_long_and_short(prompt):
+    # Split the prompt into sections
+    sections = [section.strip() for section in SECTION_SPLIT.split(prompt) if section.strip()]
+
+    # Separate long sections (more than 3 words) and short tags
+    long_sections = []
+    short_tags = []
+    for section in sections:
+        (long_sections if len(section.split()) > 3 else short_tags).append(section)
+
+    return long_sections, short_tags
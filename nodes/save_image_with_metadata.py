@@ -11,8 +11,8 @@ import logging
 import piexif
 import piexif.helper
 
+from . import a1111_metadata, hash_service, model_paths
 from .prompt_metadata_extractor import PromptMetadataExtractor
-from .utils import get_sha256
 
 # Set up logging
 logging.basicConfig(level=logging.DEBUG)
@@ -20,26 +20,7 @@ logger = logging.getLogger(__name__)
 
 class SaveImageWithMetadata:
     def __init__(self):
-        self.civitai_sampler_map = {
-            'euler_ancestral': 'Euler a',
-            'euler': 'Euler',
-            'lms': 'LMS',
-            'heun': 'Heun',
-            'dpm_2': 'DPM2',
-            'dpm_2_ancestral': 'DPM2 a',
-            'dpmpp_2s_ancestral': 'DPM++ 2S a',
-            'dpmpp_2m': 'DPM++ 2M',
-            'dpmpp_sde': 'DPM++ SDE',
-            'dpmpp_2m_sde': 'DPM++ 2M SDE',
-            'dpmpp_3m_sde': 'DPM++ 3M SDE',
-            'dpm_fast': 'DPM fast',
-            'dpm_adaptive': 'DPM adaptive',
-            'ddim': 'DDIM',
-            'plms': 'PLMS',
-            'uni_pc_bh2': 'UniPC',
-            'uni_pc': 'UniPC',
-            'lcm': 'LCM',
-        }
+        self.civitai_sampler_map = a1111_metadata.CIVITAI_SAMPLER_MAP
 
     @classmethod
     def INPUT_TYPES(cls):
@@ -92,14 +73,20 @@ class SaveImageWithMetadata:
             logger.error("Empty images tensor provided to SaveImageWithMetadata node")
             return ()
         
-        # Calculate file hash only once per checkpoint
+        # Start hashing each checkpoint once, the hashes finish while the images are converted
         checkpoint_hashes = {}
+        for checkpoint in (Stage_One, Stage_Two):
+            if checkpoint and checkpoint not in checkpoint_hashes:
+                ckpt_path = model_paths.resolve("checkpoints", checkpoint)
+                checkpoint_hashes[checkpoint] = hash_service.submit(ckpt_path) if ckpt_path else None
+
         def get_checkpoint_hash(checkpoint):
-            if checkpoint not in checkpoint_hashes:
-                ckpt_path = folder_paths.get_full_path("checkpoints", checkpoint)
-                if ckpt_path:
-                    checkpoint_hashes[checkpoint] = get_sha256(ckpt_path)[:10]
-            return checkpoint_hashes.get(checkpoint, "")
+            future = checkpoint_hashes.get(checkpoint)
+            return future.result()[:10] if future else ""
+
+        # Convert all images to PIL format
+        pil_images = [Image.fromarray(np.clip(255. * images[i].cpu().numpy(), 0, 255).astype(np.uint8))
+                      for i in range(images.shape[0])]
 
         # Base directories setup - do once
         base_dirs = {
@@ -123,42 +110,20 @@ class SaveImageWithMetadata:
         if Loras:
             positive = f"{positive}, {Loras}"
 
-        # Get model hashes - do once
-        model_hashes = []
-        checkpoints = {
-            "Stage_One": Stage_One,
-            "Stage_Two": Stage_Two
-        }
-        
-        # Build model hashes string - do once
-        for stage, checkpoint in checkpoints.items():
-            if checkpoint:
-                hash_value = get_checkpoint_hash(checkpoint)
-                if hash_value:
-                    model_name = os.path.splitext(os.path.basename(checkpoint))[0]
-                    model_hashes.append(f"Model hash: {hash_value}")
-                    model_hashes.append(f"Model: {model_name}")
-
         # Extract metadata once
         metadata_extractor = PromptMetadataExtractor([positive, negative])
         embeddings = metadata_extractor.get_embeddings()
         loras = metadata_extractor.get_loras()
 
-        # Get primary model hash for extension_hashes - do once
-        primary_hash = get_checkpoint_hash(Stage_One)
-        extension_hashes = json.dumps(embeddings | loras | {"model": primary_hash})
+        # Model hash/name pairs, only the checkpoints that have a hash get listed
+        models = [(get_checkpoint_hash(checkpoint), os.path.splitext(os.path.basename(checkpoint))[0])
+                  for checkpoint in (Stage_One, Stage_Two) if checkpoint]
 
         # Create metadata string once
         height, width = images.shape[1], images.shape[2]
-        positive_params = self.handle_whitespace(positive)
-        negative_params = f"\nNegative prompt: {self.handle_whitespace(negative)}"
-        a111_params = (
-            f"{positive_params}{negative_params}\n"
-            f"Steps: {steps}, Sampler: {self.get_civitai_sampler_name(Sampler.replace('_gpu', ''), Scheduler)}, "
-            f"CFG scale: {cfg}, Seed: {seed}, Size: {width}x{height}, "
-            f"{', '.join(model_hashes)}, "
-            f"Hashes: {extension_hashes}, Version: ComfyUI"
-        )
+        a111_params = a1111_metadata.build_params(positive, negative, steps, Sampler, Scheduler, cfg, seed, width, height,
+                                                  models, embeddings, loras, get_checkpoint_hash(Stage_One),
+                                                  skip_unhashed_models=True)
 
         # Handle multiple images as GIF or individual files
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -167,12 +132,6 @@ class SaveImageWithMetadata:
             # Create GIF from multiple images regardless of extension setting
             filename = f"{name}_{timestamp}.gif"
             
-            # Convert all images to PIL format
-            pil_images = []
-            for i in range(images.shape[0]):
-                img = Image.fromarray(np.clip(255. * images[i].cpu().numpy(), 0, 255).astype(np.uint8))
-                pil_images.append(img)
-            
             # Save GIF to each directory
             for save_dir in save_dirs:
                 filepath = os.path.join(save_dir, filename)
@@ -193,8 +152,8 @@ class SaveImageWithMetadata:
             # Save individual image (original behavior)
             filename = f"{name}_{timestamp}.{extension}"
             
-            # Convert image once for all saves
-            img = Image.fromarray(np.clip(255. * images[0].cpu().numpy(), 0, 255).astype(np.uint8))
+            # Converted once for all saves
+            img = pil_images[0]
 
             # Save to each directory
             for save_dir in save_dirs:
@@ -224,18 +183,11 @@ class SaveImageWithMetadata:
         return ()
 
     def get_civitai_sampler_name(self, sampler_name, scheduler):
-        if sampler_name in self.civitai_sampler_map:
-            civitai_name = self.civitai_sampler_map[sampler_name]
-            if scheduler == "karras":
-                civitai_name += " Karras"
-            elif scheduler == "exponential":
-                civitai_name += " Exponential"
-            return civitai_name
-        return f"{sampler_name}_{scheduler}" if scheduler != 'normal' else sampler_name
+        return a1111_metadata.civitai_sampler_name(sampler_name, scheduler)
 
     @staticmethod
     def handle_whitespace(string):
-        return string.strip().replace("\n", " ").replace("\r", " ").replace("\t", " ")
+        return a1111_metadata.handle_whitespace(string)
 
 NODE_CLASS_MAPPINGS = {
     "SaveImageWithMetadata": SaveImageWithMetadata
@@ -0,0 +1,105 @@
+import atexit
+import copy
+import json
+import os
+import tempfile
+import threading
+
+from . import file_modes
+
+# Small JSON state files that nodes update on every execution.
+#
+# Writes are skipped when nothing changed, bursts of updates are coalesced into
+# one write after a short delay, and each write goes to a temporary file that
+# is renamed over the real one so a crash or a sync client never sees a
+# half-written file. Writes are serialised, so an older snapshot can never
+# replace a newer one, and a failed write is retried after the same delay.
+
+DEBOUNCE_SECONDS = 1.0
+
+
+class JsonStateStore:
+    def __init__(self, path, defaults, delay=DEBOUNCE_SECONDS):
+        self.path = path
+        self.delay = delay
+        self._lock = threading.Lock()
+        # Held from taking a snapshot until it is on disk
+        self._write_lock = threading.Lock()
+        self._timer = None
+        self._dirty = False
+        self._data = dict(defaults)
+        try:
+            with open(path, 'r') as f:
+                self._data.update(json.load(f))
+        except FileNotFoundError:
+            self._dirty = True
+            self.flush()
+        except (OSError, ValueError) as e:
+            print(f"Unable to read {path}, starting from defaults: {e}")
+
+    @property
+    def data(self):
+        with self._lock:
+            return copy.deepcopy(self._data)
+
+    def update(self, values):
+        """Merge values into the state, scheduling a write only if it changed"""
+        with self._lock:
+            if all(self._data.get(key) == value for key, value in values.items()):
+                return False
+            self._data.update(values)
+            self._dirty = True
+            self._schedule()
+        return True
+
+    def _schedule(self):
+        # Called with self._lock held
+        if self._timer is None:
+            self._timer = threading.Timer(self.delay, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self):
+        with self._write_lock:
+            with self._lock:
+                self._timer = None
+                if not self._dirty:
+                    return
+                data = json.dumps(self._data)
+                self._dirty = False
+
+            tmp_path = None
+            try:
+                directory = os.path.dirname(self.path)
+                os.makedirs(directory, exist_ok=True)
+                fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+                with os.fdopen(fd, 'w') as f:
+                    f.write(data)
+                # mkstemp's 0600 would otherwise replace the file's own mode
+                os.chmod(tmp_path, file_modes.mode_for(self.path))
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                print(f"Unable to save {self.path}: {e}")
+                with self._lock:
+                    self._dirty = True
+                    self._schedule()
+                if tmp_path is not None:
+                    try:
+                        os.remove(tmp_path)
+                    except OSError:
+                        pass
+
+
+_stores = []
+
+
+def open_store(path, defaults, delay=DEBOUNCE_SECONDS):
+    store = JsonStateStore(path, defaults, delay)
+    _stores.append(store)
+    return store
+
+
+@atexit.register
+def _flush_all():
+    for store in _stores:
+        store.flush()
@@ -0,0 +1,267 @@
+import bisect
+import csv
+import hashlib
+import io
+import os
+import threading
+import zlib
+from collections import OrderedDict
+
+from . import style_encoding
+
+# Shared, process-wide cache of parsed style CSVs.
+#
+# Every style node used to reopen and re-parse its CSV on each execution. The
+# cache keeps the parsed rows of the most recently used files in memory and only
+# re-reads a file when its size or mtime changes. Nodes derive their own lookup
+# tables from the rows through StyleFile.view(), so each table is built once per
+# file version no matter how many prompts are queued.
+#
+# Style files mostly grow by appending rows. When a file got bigger and the
+# bytes we parsed before are unchanged (same CRC), only the new tail is parsed
+# and appended, and views registered with an extend function are updated in
+# place. Anything else falls back to a full re-parse.
+
+MAX_FILES = 8
+
+
+class StyleFile:
+    """Parsed contents of a style CSV"""
+
+    def __init__(self, path, fingerprint, encoding, rows, crc, ends_with_newline):
+        self.path = path
+        self.fingerprint = fingerprint
+        self.encoding = encoding
+        # Raw csv.reader rows, header included, blank lines dropped
+        self.rows = rows
+        self.header = rows[0] if rows else []
+        # CRC of the bytes parsed so far, to recognise an append-only change
+        self.crc = crc
+        self.ends_with_newline = ends_with_newline
+        self._views = {}
+        self._extenders = {}
+        self._lock = threading.RLock()
+
+    def records(self):
+        """Data rows as dicts, matching what csv.DictReader would yield"""
+        return self.view("records", _build_records, _extend_records)
+
+    def new_records(self, start):
+        """Records for the rows from rows[start] on, for use in extend functions"""
+        return self.records()[start - 1:]
+
+    def view(self, name, build, extend=None):
+        """Return a table derived from the rows, building it on first use.
+
+        extend(table, style_file, start) updates the table in place after rows
+        from rows[start] on were appended; views without one are rebuilt.
+        """
+        try:
+            return self._views[name]
+        except KeyError:
+            pass
+        with self._lock:
+            if name not in self._views:
+                self._views[name] = build(self)
+                if extend is not None:
+                    self._extenders[name] = extend
+            return self._views[name]
+
+    def can_append(self, data):
+        size = self.fingerprint[1]
+        return (len(self.rows) > 0 and self.ends_with_newline and len(data) >= size
+                and not self.encoding.startswith("utf-16")
+                and zlib.crc32(data[:size]) == self.crc)
+
+    def append(self, data, fingerprint):
+        """Parse the bytes past what we already have and extend every view"""
+        tail = data[self.fingerprint[1]:]
+        # Raises UnicodeDecodeError if the tail doesn't fit the file's encoding
+        text = tail.decode(self.encoding)
+        new_rows = [row for row in csv.reader(io.StringIO(text, newline='')) if row]
+        with self._lock:
+            start = len(self.rows)
+            self.rows.extend(new_rows)
+            self.fingerprint = fingerprint
+            self.crc = zlib.crc32(tail, self.crc)
+            self.ends_with_newline = data.endswith(b"\n")
+            if not new_rows:
+                return
+            # Records first, the other views build on them
+            names = sorted(self._views, key=lambda name: name != "records")
+            for name in names:
+                extend = self._extenders.get(name)
+                if extend is None:
+                    del self._views[name]
+                else:
+                    extend(self._views[name], self, start)
+
+
+def _make_records(fieldnames, rows):
+    records = []
+    for row in rows:
+        record = dict(zip(fieldnames, row))
+        if len(row) < len(fieldnames):
+            for key in fieldnames[len(row):]:
+                record[key] = None
+        elif len(row) > len(fieldnames):
+            record[None] = row[len(fieldnames):]
+        records.append(record)
+    return records
+
+
+def _build_records(style_file):
+    return _make_records(style_file.header, style_file.rows[1:])
+
+
+def _extend_records(records, style_file, start):
+    records.extend(_make_records(style_file.header, style_file.rows[start:]))
+
+
+def fingerprint(path):
+    stat = os.stat(path)
+    return (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+
+
+def _parse(key, data):
+    encoding, text = style_encoding.decode(key, data)
+    rows = [row for row in csv.reader(io.StringIO(text, newline='')) if row]
+    return StyleFile(key[0], key, encoding, rows, zlib.crc32(data), data.endswith(b"\n"))
+
+
+class StyleCache:
+    def __init__(self, max_files=MAX_FILES):
+        self.max_files = max_files
+        self._files = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.appends = 0
+        self.evictions = 0
+
+    def load(self, path):
+        """Return the StyleFile for path, parsing it only if it changed on disk"""
+        key = fingerprint(path)
+        with self._lock:
+            cached = self._files.get(key[0])
+            if cached is not None and cached.fingerprint == key:
+                self._files.move_to_end(key[0])
+                self.hits += 1
+                return cached
+            self.misses += 1
+
+        with open(path, 'rb') as f:
+            data = f.read()
+        # The file may have grown between the stat and the read
+        key = (key[0], len(data), key[2])
+
+        style_file = None
+        if cached is not None and cached.can_append(data):
+            try:
+                cached.append(data, key)
+                style_file = cached
+                with self._lock:
+                    self.appends += 1
+            except UnicodeDecodeError:
+                pass
+        if style_file is None:
+            style_file = _parse(key, data)
+
+        with self._lock:
+            self._files[key[0]] = style_file
+            self._files.move_to_end(key[0])
+            while len(self._files) > self.max_files:
+                self._files.popitem(last=False)
+                self.evictions += 1
+        return style_file
+
+    def invalidate(self, path=None):
+        with self._lock:
+            if path is None:
+                self._files.clear()
+            else:
+                self._files.pop(os.path.abspath(path), None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "appends": self.appends,
+                "evictions": self.evictions,
+                "files": len(self._files),
+            }
+
+
+def digest(value):
+    """Stable hash of value's repr, for IS_CHANGED.
+
+    Nodes return the digest of the rows they actually read, so editing other
+    rows of a CSV leaves their cached outputs, and everything downstream, alone.
+    """
+    return hashlib.sha1(repr(value).encode("utf-8")).hexdigest()
+
+
+def file_digest(path):
+    """Digest of the file's current version, for IS_CHANGED when the rows read aren't known.
+
+    ComfyUI passes IS_CHANGED only the inputs set on the node, so a linked
+    Number isn't known until the node runs; then any edit to the file counts.
+    """
+    try:
+        return digest(fingerprint(path))
+    except OSError:
+        return float("NaN")
+
+
+def nearest_position(numbers, target, lo=0, hi=None):
+    """Position in sorted numbers[lo:hi] of the value closest to target, or None"""
+    hi = len(numbers) if hi is None else hi
+    if lo >= hi:
+        return None
+    position = bisect.bisect_left(numbers, target, lo, hi)
+    if position == hi:
+        return hi - 1
+    if position > lo and target - numbers[position - 1] <= numbers[position] - target:
+        return position - 1
+    return position
+
+
+def range_positions(numbers, low, high, lo=0, hi=None):
+    """(start, stop) positions of the values in sorted numbers within [low, high]"""
+    hi = len(numbers) if hi is None else hi
+    start = bisect.bisect_left(numbers, low, lo, hi)
+    stop = bisect.bisect_right(numbers, high, start, hi)
+    return start, stop
+
+
+def step_position(numbers, target, low, high, step, lo=0, hi=None):
+    """Position of the first value at or past target in the direction of step.
+
+    Only values within [low, high] count, and the search wraps around to the
+    other end of that range the way Increment/Decrement wrap. Returns None if
+    no value falls in the range.
+    """
+    start, stop = range_positions(numbers, low, high, lo, hi)
+    if start >= stop:
+        return None
+    if step > 0:
+        position = bisect.bisect_left(numbers, target, start, stop)
+        return position if position < stop else start
+    position = bisect.bisect_right(numbers, target, start, stop) - 1
+    return position if position >= start else stop - 1
+
+
+_cache = StyleCache()
+
+
+def load(path):
+    return _cache.load(path)
+
+
+def invalidate(path=None):
+    _cache.invalidate(path)
+
+
+def stats():
+    return _cache.stats()
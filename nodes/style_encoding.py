@@ -0,0 +1,97 @@
+import codecs
+import threading
+
+# Encoding detection for style CSVs.
+#
+# The loaders used to try ['utf-8', 'ISO-8859-1', 'utf-16', 'windows-1252'] in
+# turn, re-reading the whole file for each attempt. Instead we check for a BOM,
+# probe a bounded sample from the start and end of the file, and remember the
+# answer per file version. The file's bytes are read once and decoded once; if
+# the sample guessed UTF-8 but a stray byte further in proves otherwise, we
+# re-decode the bytes already in memory rather than reading the file again.
+
+SAMPLE_BYTES = 64 * 1024
+
+BOMS = [
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+]
+
+_encodings = {}
+_lock = threading.Lock()
+
+
+def _is_utf8(sample, at_start):
+    if not at_start:
+        # A tail sample may begin part way through a multi-byte character
+        skip = 0
+        while skip < min(3, len(sample)) and 0x80 <= sample[skip] <= 0xBF:
+            skip += 1
+        sample = sample[skip:]
+    try:
+        # final=False lets the sample end part way through a character
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+        return True
+    except UnicodeDecodeError:
+        return False
+
+
+def _fallback(data):
+    # The probe decodes the whole file, so hand its text on rather than decoding again
+    try:
+        return "windows-1252", data.decode("windows-1252")
+    except UnicodeDecodeError:
+        # A handful of bytes are undefined in cp1252, Latin-1 maps every byte
+        return "ISO-8859-1", data.decode("ISO-8859-1")
+
+
+def fallback_encoding(data):
+    """Single-byte encoding for data that isn't UTF-8"""
+    return _fallback(data)[0]
+
+
+def _detect(data):
+    # (encoding, text), text is None unless detection had to decode all of data
+    for bom, encoding in BOMS:
+        if data.startswith(bom):
+            return encoding, None
+
+    head = data[:SAMPLE_BYTES]
+    tail = data[-SAMPLE_BYTES:] if len(data) > SAMPLE_BYTES else b""
+
+    # UTF-16 without a BOM shows up as a NUL in every other byte
+    if len(head) >= 4 and head.count(0) > len(head) // 4:
+        return ("utf-16-le" if head[1::2].count(0) > head[0::2].count(0) else "utf-16-be"), None
+
+    if _is_utf8(head, True) and _is_utf8(tail, False):
+        return "utf-8", None
+    return _fallback(data)
+
+
+def detect(data):
+    """Guess the encoding of CSV bytes from a BOM and a bounded sample"""
+    return _detect(data)[0]
+
+
+def decode(fingerprint, data):
+    """Decode the bytes of a style CSV, returning (encoding, text).
+
+    fingerprint is the (path, size, mtime) of the file data was read from. The
+    detected encoding is remembered per file version, so later reads of an
+    unchanged file skip detection entirely.
+    """
+    with _lock:
+        cached = _encodings.get(fingerprint[0])
+    encoding, text = (cached[1], None) if cached and cached[0] == fingerprint else _detect(data)
+
+    if text is None:
+        try:
+            text = data.decode(encoding)
+        except UnicodeDecodeError:
+            # The sample looked like UTF-8 but the rest of the file isn't
+            encoding, text = _fallback(data)
+
+    with _lock:
+        _encodings[fingerprint[0]] = (fingerprint, encoding)
+    return encoding, text
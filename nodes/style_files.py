@@ -0,0 +1,111 @@
+import fnmatch
+import os
+import threading
+import time
+from pathlib import Path
+
+import folder_paths
+
+from . import style_cache
+
+# Cached listing of the style CSVs offered by the style nodes.
+#
+# INPUT_TYPES runs every time the UI refreshes object_info, so rather than
+# globbing the style folders each time we keep the listing in memory and let a
+# background thread poll the folders for changes. When a CSV goes away its
+# parsed copy in style_cache is dropped with it. Indexes in style_index are left
+# alone, since a node may be reading one on the execution thread; get_index
+# retires them itself once the file's fingerprint no longer matches.
+
+STYLE_DIRS = [
+    Path(folder_paths.base_path) / "styles",
+    Path(r"C:\Users\rober\OneDrive\Documents\Sketchbook")
+]
+POLL_SECONDS = 2.0
+
+
+class StyleFileWatcher:
+    def __init__(self, dirs, interval=POLL_SECONDS):
+        self.dirs = dirs
+        self.interval = interval
+        # name -> (path, size, mtime_ns), first folder wins like the old lookups
+        self._files = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def _scan(self):
+        files = {}
+        for directory in self.dirs:
+            try:
+                entries = sorted(os.scandir(directory), key=lambda entry: entry.name)
+            except OSError:
+                continue
+            for entry in entries:
+                if entry.name in files or not fnmatch.fnmatch(entry.name, "*.csv"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                if entry.is_file():
+                    files[entry.name] = (Path(entry.path), stat.st_size, stat.st_mtime_ns)
+        return files
+
+    def refresh(self):
+        files = self._scan()
+        with self._lock:
+            previous, self._files = self._files, files
+        for name, (path, _, _) in previous.items():
+            current = files.get(name)
+            # style_cache checks a changed file itself and may only need to parse an appended tail
+            if current is None or current[0] != path:
+                style_cache.invalidate(path)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Error watching style folders: {e}")
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="MoserStyleFileWatcher", daemon=True)
+        self.refresh()
+        self._thread.start()
+
+    def names(self):
+        self._ensure_started()
+        with self._lock:
+            return list(self._files)
+
+    def find(self, name):
+        self._ensure_started()
+        with self._lock:
+            entry = self._files.get(name)
+        if entry is not None:
+            return entry[0]
+        # The file may be newer than the last poll
+        for directory in self.dirs:
+            path = directory / name
+            if path.exists():
+                return path
+        return None
+
+
+_watcher = StyleFileWatcher(STYLE_DIRS)
+
+
+def list_csv_files():
+    """Names of the style CSVs in the style folders"""
+    return _watcher.names()
+
+
+def find_csv_file(name):
+    """Full path of the named style CSV, or None"""
+    return _watcher.find(name)
@@ -0,0 +1,241 @@
+from array import array
+import bisect
+import csv
+import hashlib
+import io
+import mmap
+import os
+import struct
+import threading
+
+from . import style_cache, style_encoding
+
+# Compiled sidecar index for large style CSVs.
+#
+# Parsing a big prompt library just to read one style is wasteful, so for large
+# files we compile a binary index next to our data folder that maps each data
+# row to its byte range in the CSV and each Number to its row. The index is
+# memory-mapped; a lookup bisects the mapped Number table and decodes only the
+# one row it needs. The index file name embeds the CSV's size and mtime, so an
+# edited CSV simply gets a fresh index and stale ones are cleaned up.
+
+INDEX_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "style_index")
+INDEX_MIN_BYTES = 8 * 1024 * 1024
+
+MAGIC = b"MOSERIDX"
+VERSION = 2
+# magic, version, csv size, csv mtime_ns, row count, number count, header start, header end, encoding
+HEADER = struct.Struct("=8sIqqqqqq16s")
+
+
+class StyleIndex:
+    """Memory-mapped row and Number index for one version of a style CSV"""
+
+    def __init__(self, csv_path, index_path, fingerprint):
+        self.csv_path = csv_path
+        self.index_path = index_path
+        self.fingerprint = fingerprint
+        with open(index_path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, size, mtime_ns, row_count, number_count, header_start, header_end, encoding = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION or (size, mtime_ns) != fingerprint[1:]:
+            self._mm.close()
+            raise ValueError(f"Stale or invalid style index {index_path}")
+
+        self.encoding = encoding.rstrip(b"\0").decode("ascii")
+        self.row_count = row_count
+        self._view = view = memoryview(self._mm)
+        offset = HEADER.size
+        self._row_starts = view[offset:offset + 8 * row_count].cast("q")
+        offset += 8 * row_count
+        self._row_ends = view[offset:offset + 8 * row_count].cast("q")
+        offset += 8 * row_count
+        # Sorted Number values and the row each one lives on
+        self.numbers = view[offset:offset + 8 * number_count].cast("q")
+        offset += 8 * number_count
+        self._number_rows = view[offset:offset + 8 * number_count].cast("q")
+
+        self.header = self._read_row(header_start, header_end)
+
+    def __len__(self):
+        return self.row_count
+
+    def _read_row(self, start, end):
+        with open(self.csv_path, "rb") as f:
+            f.seek(start)
+            data = f.read(end - start)
+        return next(csv.reader(io.StringIO(data.decode(self.encoding), newline="")), [])
+
+    def row(self, i):
+        """Decode data row i as a list of strings"""
+        return self._read_row(self._row_starts[i], self._row_ends[i])
+
+    def record(self, i):
+        """Decode data row i as a dict, like csv.DictReader would"""
+        row = self.row(i)
+        record = dict(zip(self.header, row))
+        for key in self.header[len(row):]:
+            record[key] = None
+        return record
+
+    def find(self, number):
+        """Return the row index holding Number, or None"""
+        i = bisect.bisect_left(self.numbers, number)
+        if i < len(self.numbers) and self.numbers[i] == number:
+            return self._number_rows[i]
+        return None
+
+    def row_for_position(self, position):
+        """Row index of the position'th entry in the sorted Number table"""
+        return self._number_rows[position]
+
+    def close(self):
+        self._row_starts.release()
+        self._row_ends.release()
+        self.numbers.release()
+        self._number_rows.release()
+        self._view.release()
+        self._mm.close()
+
+
+def _scan_rows(data, encoding):
+    """Yield (row, start, end) byte ranges for every non-blank CSV row"""
+    pos = 0
+
+    def lines():
+        nonlocal pos
+        start = 0
+        while start < len(data):
+            newline = data.find(b"\n", start)
+            end = len(data) if newline < 0 else newline + 1
+            pos = end
+            yield data[start:end].decode(encoding)
+            start = end
+
+    row_start = 0
+    for row in csv.reader(lines()):
+        row_end = pos
+        if row:
+            yield row, row_start, row_end
+        row_start = row_end
+
+
+def _compile(csv_path, index_path, fingerprint):
+    with open(csv_path, "rb") as f:
+        data = f.read()
+
+    encoding, _ = style_encoding.decode(fingerprint, data)
+    if encoding.startswith("utf-16"):
+        # Rows can't be split on b"\n" in UTF-16, leave these to the in-memory cache
+        return False
+
+    rows = list(_scan_rows(data, encoding))
+
+    if not rows:
+        return False
+
+    header, header_start, header_end = rows[0]
+    number_column = header.index("Number") if "Number" in header else None
+
+    row_starts = []
+    row_ends = []
+    numbers = {}
+    for i, (row, start, end) in enumerate(rows[1:]):
+        row_starts.append(start)
+        row_ends.append(end)
+        if number_column is not None and number_column < len(row):
+            try:
+                # Later rows win, as they do when the nodes build their dicts
+                numbers[int(row[number_column].strip())] = i
+            except ValueError:
+                pass
+
+    sorted_numbers = sorted(numbers)
+    row_count = len(row_starts)
+    with open(index_path + ".tmp", "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, fingerprint[1], fingerprint[2], row_count, len(sorted_numbers),
+                            header_start, header_end, encoding.encode("ascii")))
+        array("q", row_starts).tofile(f)
+        array("q", row_ends).tofile(f)
+        array("q", sorted_numbers).tofile(f)
+        array("q", (numbers[n] for n in sorted_numbers)).tofile(f)
+    os.replace(index_path + ".tmp", index_path)
+    return True
+
+
+def _index_path(fingerprint):
+    name = hashlib.sha1(fingerprint[0].encode("utf-8")).hexdigest()[:16]
+    return os.path.join(INDEX_DIR, f"{name}-{fingerprint[1]}-{fingerprint[2]}.idx")
+
+
+def _remove_stale(index_path):
+    prefix = os.path.basename(index_path).split("-", 1)[0] + "-"
+    for entry in os.listdir(INDEX_DIR):
+        if entry.startswith(prefix) and os.path.join(INDEX_DIR, entry) != index_path:
+            try:
+                os.remove(os.path.join(INDEX_DIR, entry))
+            except OSError:
+                # Still mapped by another process, try again next rebuild
+                pass
+
+
+_indexes = {}
+# Fingerprints of files that couldn't be indexed, so we don't retry every call
+_unindexable = {}
+_lock = threading.Lock()
+
+
+def invalidate(csv_path):
+    """Close any index held open for csv_path"""
+    path = os.path.abspath(csv_path)
+    with _lock:
+        _unindexable.pop(path, None)
+        index = _indexes.pop(path, None)
+        if index is not None:
+            index.close()
+
+
+def get_index(csv_path, min_bytes=INDEX_MIN_BYTES):
+    """Return a StyleIndex for csv_path, compiling it if needed.
+
+    Returns None for files smaller than min_bytes or that can't be indexed, in
+    which case callers should fall back to style_cache.
+    """
+    fingerprint = style_cache.fingerprint(csv_path)
+    if fingerprint[1] < min_bytes:
+        return None
+
+    with _lock:
+        if _unindexable.get(fingerprint[0]) == fingerprint:
+            return None
+
+        index = _indexes.get(fingerprint[0])
+        if index is not None:
+            if index.fingerprint == fingerprint:
+                return index
+            index.close()
+            del _indexes[fingerprint[0]]
+
+        os.makedirs(INDEX_DIR, exist_ok=True)
+        index_path = _index_path(fingerprint)
+        try:
+            index = None
+            if os.path.exists(index_path):
+                try:
+                    index = StyleIndex(fingerprint[0], index_path, fingerprint)
+                except ValueError:
+                    # Written by an older version of the index format
+                    os.remove(index_path)
+            if index is None:
+                if not _compile(csv_path, index_path, fingerprint):
+                    _unindexable[fingerprint[0]] = fingerprint
+                    return None
+                index = StyleIndex(fingerprint[0], index_path, fingerprint)
+        except (OSError, ValueError) as e:
+            print(f"Unable to build style index for {csv_path}: {e}")
+            return None
+
+        _remove_stale(index_path)
+        _indexes[fingerprint[0]] = index
+        return index
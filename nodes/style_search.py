@@ -0,0 +1,47 @@
+from . import style_files, style_store
+
+ALL_FILES = "All"
+
+class MoserStyleSearch:
+    """Search every style CSV by Name, Positive, Negative and Lora"""
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "csv_file": ([ALL_FILES] + style_files.list_csv_files(),),
+                "query": ("STRING", {"default": ""}),
+                "limit": ("INT", {"default": 50, "min": 1, "max": 10000}),
+            }
+        }
+
+    CATEGORY = "Moser"
+
+    # files is last so workflows linked to the first three outputs keep working
+    RETURN_TYPES = ("INT", "STRING", "STRING", "STRING")
+    RETURN_NAMES = ("numbers", "names", "prompt_numbers", "files")
+    OUTPUT_IS_LIST = (True, True, False, True)
+    FUNCTION = "search"
+
+    def search(self, csv_file, query, limit):
+        try:
+            matches = style_store.get_store().search(query, None if csv_file == ALL_FILES else csv_file, limit)
+        except Exception as e:
+            print(f"Error searching styles: {str(e)}")
+            return ([], [], "", [])
+
+        files = [file for file, _, _ in matches]
+        numbers = [number for _, number, _ in matches]
+        names = [name for _, _, name in matches]
+        # Comma separated as well, ready for Moser Styles Full (Batch). Numbers
+        # from different files would collide there, so only for a single file
+        prompt_numbers = "" if csv_file == ALL_FILES else ", ".join(str(number) for number in numbers)
+        return (numbers, names, prompt_numbers, files)
+
+NODE_CLASS_MAPPINGS = {
+    "MoserStyleSearch": MoserStyleSearch,
+}
+
+NODE_DISPLAY_NAME_MAPPINGS = {
+    "MoserStyleSearch": "Moser Style Search",
+}
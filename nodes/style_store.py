@@ -0,0 +1,184 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+
+from . import style_cache, style_files
+
+# Optional SQLite store of every style CSV, with full-text search.
+#
+# Each CSV in the style folders is copied into one SQLite database and only
+# re-indexed when its size or mtime changes. Styles can then be searched across
+# all files by Name, Positive, Negative and Lora through an FTS5 index, and the
+# loaders can fetch a style by number without touching the CSV. If the SQLite
+# build has no FTS5, search falls back to LIKE queries.
+
+DB_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "style_store.sqlite3")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS styles (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL,
+    number INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    positive TEXT NOT NULL,
+    negative TEXT NOT NULL,
+    lora TEXT NOT NULL,
+    row_json TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS styles_path_number ON styles (path, number);
+"""
+
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS styles_fts USING fts5(
+    name, positive, negative, lora, content='styles', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS styles_ai AFTER INSERT ON styles BEGIN
+    INSERT INTO styles_fts (rowid, name, positive, negative, lora)
+    VALUES (new.id, new.name, new.positive, new.negative, new.lora);
+END;
+CREATE TRIGGER IF NOT EXISTS styles_ad AFTER DELETE ON styles BEGIN
+    INSERT INTO styles_fts (styles_fts, rowid, name, positive, negative, lora)
+    VALUES ('delete', old.id, old.name, old.positive, old.negative, old.lora);
+END;
+"""
+
+
+class StyleStore:
+    def __init__(self, db_path=DB_PATH):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.has_fts = None
+        # path -> ((size, mtime_ns), sorted numbers)
+        self._numbers = {}
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.executescript(SCHEMA)
+            if self.has_fts is None:
+                try:
+                    conn.executescript(FTS_SCHEMA)
+                    self.has_fts = True
+                except sqlite3.OperationalError:
+                    print("SQLite has no FTS5 support, style search will use LIKE queries")
+                    self.has_fts = False
+            self._local.conn = conn
+        return conn
+
+    def sync_file(self, path):
+        """Re-index path if it changed since it was last stored"""
+        key = style_cache.fingerprint(path)
+        conn = self._connect()
+        with self._lock:
+            stored = conn.execute("SELECT size, mtime_ns FROM files WHERE path = ?", (key[0],)).fetchone()
+            if stored is not None and tuple(stored) == key[1:]:
+                return False
+
+            records = style_cache.load(path).records()
+            rows = []
+            for record in records:
+                try:
+                    number = int((record.get("Number") or "").strip())
+                except ValueError:
+                    continue
+                lora = ", ".join(value.strip() for value in (record.get("Lora"), record.get("PDXL Loras")) if value and value.strip())
+                rows.append((key[0], number, (record.get("Name") or "").strip(), (record.get("Positive") or "").strip(),
+                             (record.get("Negative") or "").strip(), lora,
+                             json.dumps({k: v for k, v in record.items() if k is not None})))
+
+            with conn:
+                conn.execute("DELETE FROM styles WHERE path = ?", (key[0],))
+                conn.executemany("INSERT INTO styles (path, number, name, positive, negative, lora, row_json) "
+                                 "VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+                conn.execute("INSERT OR REPLACE INTO files (path, name, size, mtime_ns) VALUES (?, ?, ?, ?)",
+                             (key[0], os.path.basename(key[0]), key[1], key[2]))
+            self._numbers.pop(key[0], None)
+            return True
+
+    def sync(self):
+        """Index every style CSV that changed and drop the ones that are gone"""
+        paths = set()
+        for name in style_files.list_csv_files():
+            path = style_files.find_csv_file(name)
+            if path is not None:
+                paths.add(os.path.abspath(path))
+                self.sync_file(path)
+
+        conn = self._connect()
+        with self._lock:
+            stale = [row["path"] for row in conn.execute("SELECT path FROM files") if row["path"] not in paths]
+            with conn:
+                for path in stale:
+                    conn.execute("DELETE FROM styles WHERE path = ?", (path,))
+                    conn.execute("DELETE FROM files WHERE path = ?", (path,))
+
+    def search(self, query, csv_file=None, limit=50):
+        """Return (file name, number, name) of the styles best matching query"""
+        self.sync()
+        terms = re.findall(r"\w+", query)
+        if not terms:
+            return []
+
+        conn = self._connect()
+        params = []
+        if self.has_fts:
+            # Quote each term so user input can't break the FTS query syntax
+            sql = ("SELECT f.name AS file, s.number, s.name FROM styles_fts "
+                   "JOIN styles s ON s.id = styles_fts.rowid JOIN files f ON f.path = s.path "
+                   "WHERE styles_fts MATCH ?")
+            params.append(" ".join(f'"{term}"*' for term in terms))
+        else:
+            sql = ("SELECT f.name AS file, s.number, s.name FROM styles s JOIN files f ON f.path = s.path WHERE 1")
+            for term in terms:
+                sql += " AND (s.name LIKE ? OR s.positive LIKE ? OR s.negative LIKE ? OR s.lora LIKE ?)"
+                params.extend([f"%{term}%"] * 4)
+        if csv_file:
+            sql += " AND f.name = ?"
+            params.append(csv_file)
+        sql += " ORDER BY bm25(styles_fts)" if self.has_fts else " ORDER BY f.name, s.number"
+        sql += " LIMIT ?"
+        params.append(limit)
+        return [(row["file"], row["number"], row["name"]) for row in conn.execute(sql, params)]
+
+    def fetch(self, path, number):
+        """The stored row for number in path as a dict, like csv.DictReader would give"""
+        self.sync_file(path)
+        row = self._connect().execute(
+            "SELECT row_json FROM styles WHERE path = ? AND number = ? ORDER BY id DESC LIMIT 1",
+            (os.path.abspath(path), number)).fetchone()
+        return json.loads(row["row_json"]) if row else None
+
+    def numbers(self, path):
+        """Sorted style numbers stored for path"""
+        self.sync_file(path)
+        key = style_cache.fingerprint(path)
+        cached = self._numbers.get(key[0])
+        if cached is None or cached[0] != key[1:]:
+            rows = self._connect().execute(
+                "SELECT DISTINCT number FROM styles WHERE path = ? ORDER BY number", (key[0],))
+            cached = self._numbers[key[0]] = (key[1:], [row["number"] for row in rows])
+        return cached[1]
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = StyleStore()
+        return _store
@@ -0,0 +1,133 @@
+import threading
+
+import numpy as np
+
+from .prompt_tags import split_long_and_short
+
+# Tag frequency and co-occurrence index over a whole style CSV.
+#
+# Every row's short tags (as split by prompt_tags) are interned into a
+# vocabulary and kept as a sparse row x tag matrix in CSR form, with the
+# transposed tag x row matrix alongside it. Co-occurrence with a set of seed
+# tags is then two bincounts over those arrays instead of a Python loop over
+# the rows. The index lives as a style_cache view, so it is rebuilt when the
+# CSV changes and only extended when rows are appended.
+
+
+class TagIndex:
+    def __init__(self):
+        self.vocab = []          # tag id -> tag as first written
+        self._ids = {}           # normalized tag -> tag id
+        self._row_ids = []       # tag ids of each row, flattened
+        self._row_ends = []      # end offset of each row in _row_ids
+        self._lock = threading.Lock()
+        self._arrays = None
+
+    def add_rows(self, rows):
+        with self._lock:
+            for row in rows:
+                if 'Number' not in row or 'Positive' not in row:
+                    continue
+                _, short_tags = split_long_and_short(row['Positive'] or "")
+                seen = set()
+                for tag in short_tags:
+                    tag_id = self._intern(tag)
+                    if tag_id not in seen:
+                        seen.add(tag_id)
+                        self._row_ids.append(tag_id)
+                self._row_ends.append(len(self._row_ids))
+            self._arrays = None
+
+    def _intern(self, tag):
+        key = normalize(tag)
+        tag_id = self._ids.get(key)
+        if tag_id is None:
+            tag_id = self._ids[key] = len(self.vocab)
+            self.vocab.append(tag)
+        return tag_id
+
+    def tag_id(self, tag):
+        return self._ids.get(normalize(tag))
+
+    def arrays(self):
+        """(indptr, indices, tag_indptr, tag_rows, frequency) as NumPy arrays, compiled on first use"""
+        arrays = self._arrays
+        if arrays is None:
+            with self._lock:
+                arrays = self._arrays
+                if arrays is None:
+                    arrays = self._arrays = self._compile()
+        return arrays
+
+    def _compile(self):
+        indices = np.asarray(self._row_ids, dtype=np.int32)
+        indptr = np.zeros(len(self._row_ends) + 1, dtype=np.int64)
+        indptr[1:] = self._row_ends
+        frequency = np.bincount(indices, minlength=len(self.vocab))
+
+        # Transpose to tag -> rows, a stable sort keeps each tag's rows in order
+        rows = np.repeat(np.arange(len(self._row_ends), dtype=np.int32), np.diff(indptr))
+        order = np.argsort(indices, kind="stable")
+        tag_rows = rows[order]
+        tag_indptr = np.zeros(len(self.vocab) + 1, dtype=np.int64)
+        np.cumsum(frequency, out=tag_indptr[1:])
+        return indptr, indices, tag_indptr, tag_rows, frequency
+
+    def cooccurrence(self, seed_ids, arrays=None):
+        """Rows shared by each tag with the seed tags, counted once per seed tag in the row"""
+        indptr, indices, tag_indptr, tag_rows, frequency = arrays or self.arrays()
+        # Tags interned after the arrays were compiled have no rows in them yet
+        seed_ids = [i for i in seed_ids if i < len(frequency)]
+        if not seed_ids:
+            return np.zeros(len(frequency), dtype=np.float64)
+        seed_rows = np.concatenate([tag_rows[tag_indptr[i]:tag_indptr[i + 1]] for i in seed_ids])
+        row_hits = np.bincount(seed_rows, minlength=len(indptr) - 1)
+        return np.bincount(indices, weights=np.repeat(row_hits, np.diff(indptr)), minlength=len(frequency))
+
+    def candidates(self, seed_tags):
+        """(tag ids, weights) of the tags that appear alongside seed_tags, excluding the seeds themselves.
+
+        Tags are weighted by co-occurrence over the square root of their
+        frequency, which keeps tags found in nearly every row from crowding
+        out the ones specific to the seeds. Computing this is the costly part
+        of sampling, so callers drawing several samples compute it once.
+        """
+        arrays = self.arrays()
+        frequency = arrays[4]
+        seed_ids = sorted({i for i in map(self.tag_id, seed_tags) if i is not None})
+        weights = self.cooccurrence(seed_ids, arrays)
+        weights[[i for i in seed_ids if i < len(weights)]] = 0
+        candidates = np.flatnonzero(weights)
+        return candidates, weights[candidates] / np.sqrt(frequency[candidates])
+
+    def sample(self, candidates, k, rng):
+        """Pick k distinct tags from candidates() by weight. rng is a numpy Generator."""
+        candidates, weights = candidates
+        if not len(candidates):
+            return []
+
+        # Efraimidis-Spirakis keys in log form, the k largest win
+        keys = np.log(rng.random(len(candidates))) / weights
+        k = min(k, len(candidates))
+        top = np.argpartition(keys, -k)[-k:]
+        top = top[np.argsort(keys[top])[::-1]]
+        return [self.vocab[i] for i in candidates[top]]
+
+
+def normalize(tag):
+    return " ".join(tag.split()).lower()
+
+
+def build(style_file):
+    index = TagIndex()
+    index.add_rows(style_file.records())
+    return index
+
+
+def extend(index, style_file, start):
+    index.add_rows(style_file.new_records(start))
+
+
+def get_index(style_file):
+    """The tag index of a loaded style_cache.StyleFile"""
+    return style_file.view("tag_index", build, extend)
@@ -1,21 +1,19 @@
-import csv
-from pathlib import Path
-import folder_paths
+from . import style_cache, style_index, style_files
+
+# Columns one node can read at once, each gets its own output
+MAX_COLUMNS = 8
 
 class ValueOverrideNode:
-    """Load a specific value from a CSV file based on prompt number and column name"""
+    """Load specific values from a CSV file based on prompt number and column names.
+
+    column_name takes up to MAX_COLUMNS names separated by commas or new lines,
+    and the value of the n-th one comes out of the n-th output: value, then
+    value_2 to value_8. Outputs past the last name are empty strings.
+    """
 
     @classmethod
     def INPUT_TYPES(cls):
-        input_dirs = [
-            Path(folder_paths.base_path) / "styles",
-            Path(r"C:\Users\rober\OneDrive\Documents\Sketchbook")
-        ]
-        
-        csv_files = []
-        for input_dir in input_dirs:
-            if input_dir.exists():
-                csv_files.extend([f.name for f in input_dir.glob("*.csv")])
+        csv_files = style_files.list_csv_files()
         
         if not csv_files:
             print("No CSV files found in the styles folder or Sketchbook. Place at least one csv file in ComfyUI/styles/ or C:\\Users\\rober\\OneDrive\\Documents\\Sketchbook\\")
@@ -25,50 +23,69 @@ class ValueOverrideNode:
             "required": {
                 "csv_file": (csv_files,),
                 "prompt_number": ("INT", {"default": 0}),
-                "column_name": ("STRING", {"default": ""}),
+                "column_name": ("STRING", {"default": "", "tooltip": f"column to read, or up to {MAX_COLUMNS} separated by commas or new lines, one per output"}),
             }
         }
 
     CATEGORY = "Value Override"
 
-    RETURN_TYPES = ("STRING",)
-    RETURN_NAMES = ("value",)
+    # value keeps the first slot so existing links still get the first column
+    RETURN_TYPES = ("STRING",) * MAX_COLUMNS
+    RETURN_NAMES = ("value",) + tuple(f"value_{n}" for n in range(2, MAX_COLUMNS + 1))
     FUNCTION = "get_value"
 
     def get_value(self, csv_file, prompt_number, column_name):
+        empty = ("",) * MAX_COLUMNS
         if not csv_file:
             print("No CSV file selected")
-            return ("",)
+            return empty
 
-        input_dirs = [
-            Path(folder_paths.base_path) / "styles",
-            Path(r"C:\Users\rober\OneDrive\Documents\Sketchbook")
-        ]
-        
-        file_path = None
-        for input_dir in input_dirs:
-            temp_path = input_dir / csv_file
-            if temp_path.exists():
-                file_path = temp_path
-                break
+        file_path = style_files.find_csv_file(csv_file)
 
         if not file_path:
             print(f"CSV file '{csv_file}' not found in any of the search directories.")
-            print(f"Searched directories: {[str(d) for d in input_dirs]}")
-            return ("",)
+            print(f"Searched directories: {[str(d) for d in style_files.STYLE_DIRS]}")
+            return empty
+
+        columns = [name.strip() for name in column_name.replace("\n", ",").split(",") if name.strip()] or [column_name]
+        if len(columns) > MAX_COLUMNS:
+            print(f"Only the first {MAX_COLUMNS} of {len(columns)} columns are output")
+            columns = columns[:MAX_COLUMNS]
 
         try:
-            with open(file_path, mode='r', newline='', encoding='utf-8') as csvfile:
-                reader = csv.DictReader(csvfile)
-                for i, row in enumerate(reader):
-                    if i == prompt_number:
-                        return (row.get(column_name, ""),)
+            row = _read_row(file_path, prompt_number)
+            if row is not None:
+                values = [row.get(column, "") for column in columns]
+                return tuple(values) + empty[len(values):]
         except FileNotFoundError:
             print(f"File not found: {file_path}")
         except Exception as e:
             print(f"An error occurred: {e}")
         
-        return ("",)
+        return empty
+
+    @classmethod
+    def IS_CHANGED(cls, **kwargs):
+        # Linked inputs are missing or None here, see style_cache.file_digest
+        csv_file = kwargs.get("csv_file")
+        file_path = style_files.find_csv_file(csv_file) if csv_file else None
+        if not file_path:
+            return ""
+        prompt_number = kwargs.get("prompt_number")
+        if prompt_number is None:
+            return style_cache.file_digest(file_path)
+        try:
+            return style_cache.digest(_read_row(file_path, prompt_number))
+        except Exception:
+            return float("NaN")
+
+def _read_row(file_path, prompt_number):
+    # Every file gets a row-offset index so we can seek straight to the row
+    index = style_index.get_index(file_path, min_bytes=0)
+    if index is not None:
+        return index.record(prompt_number) if 0 <= prompt_number < len(index) else None
+    records = style_cache.load(file_path).records()
+    return records[prompt_number] if 0 <= prompt_number < len(records) else None
 
 NODE_CLASS_MAPPINGS = {
     'ValueOverrideNode': ValueOverrideNode